@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Site, EmergencyContact, Incident, IncidentImage, NotificationEmail, IncidentType
+from .models import Site, EmergencyContact, Incident, IncidentImage, ImageBlob, NotificationEmail, NotificationOutbox, IncidentType
+from .search import search_incidents
 
 
 class IncidentImageInline(admin.TabularInline):
@@ -33,6 +34,15 @@ class NotificationEmailAdmin(admin.ModelAdmin):
     ordering = ['email']
 
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['incident', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['last_error']
+    readonly_fields = ['id', 'incident', 'attempts', 'last_error', 'created_at', 'sent_at']
+    ordering = ['-created_at']
+
+
 @admin.register(EmergencyContact)
 class EmergencyContactAdmin(admin.ModelAdmin):
     list_display = ['name', 'designation', 'phone_number', 'site']
@@ -45,6 +55,7 @@ class EmergencyContactAdmin(admin.ModelAdmin):
 class IncidentAdmin(admin.ModelAdmin):
     list_display = ['incident_type', 'criticality', 'status', 'site', 'is_anonymous', 'image_count', 'created_at']
     list_filter = ['incident_type', 'criticality', 'status', 'site', 'is_anonymous', 'created_at']
+    list_select_related = ['site', 'incident_type__site']
     search_fields = ['description', 'reporter_name']
     readonly_fields = ['id', 'created_at', 'updated_at', 'image_count']
     inlines = [IncidentImageInline]
@@ -62,6 +73,15 @@ class IncidentAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_image_count()
+
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the full-text index rather than ILIKE '%term%' over every row
+        if not search_term.strip():
+            return queryset, False
+        return search_incidents(queryset, search_term), False
+
 
 @admin.register(IncidentImage)
 class IncidentImageAdmin(admin.ModelAdmin):
@@ -74,7 +94,15 @@ class IncidentImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;" />',
-                obj.image.url
+                (obj.thumbnail or obj.image).url
             )
         return "No image"
-    image_preview.short_description = 'Preview' 
\ No newline at end of file
+    image_preview.short_description = 'Preview' 
+
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'processed_at', 'failed_at', 'created_at']
+    list_filter = ['created_at', 'failed_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'thumbnail', 'size', 'ref_count', 'processed_at', 'failed_at', 'created_at']
@@ -0,0 +1,95 @@
+"""
+Idempotency-Key handling for incident submission
+
+Clients on flaky connections resend the same POST with the same
+Idempotency-Key header. The first request to commit stores its response
+under the key, in the same transaction as the incident it created; retries
+within IDEMPOTENCY_KEY_TTL get that response back without validating,
+writing images or queueing another notification.
+
+Concurrent duplicates are serialized by the key's primary key: the second
+insert waits on the first transaction's uncommitted row, then fails and
+replays the committed response.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+import hashlib
+import json
+
+from .models import IdempotencyKey, file_sha256
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+class IdempotencyError(Exception):
+    """A key that cannot be used for this request"""
+
+    def __init__(self, message, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_idempotency_key(request):
+    """Return the request's Idempotency-Key header, or None; raises IdempotencyError if malformed"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise IdempotencyError(f'{IDEMPOTENCY_HEADER} must be 1 to 255 characters', status.HTTP_400_BAD_REQUEST)
+    return key
+
+
+def request_fingerprint(request):
+    """Return a digest of the request's form fields and uploaded files"""
+    fields = request.POST if request.FILES else request.data
+    items = sorted(fields.lists()) if hasattr(fields, 'lists') else fields
+    files = sorted((name, file_sha256(file)) for name, uploads in request.FILES.lists() for file in uploads)
+    payload = json.dumps([request.path, items, files], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def replay_response(key, fingerprint):
+    """Return the stored response for a key, or None if there is none (or it expired)"""
+    record = IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+    if record is None or record.status_code is None:
+        return None
+    if record.fingerprint != fingerprint:
+        raise IdempotencyError(f'{IDEMPOTENCY_HEADER} was already used for a different request')
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def claim_key(key, fingerprint):
+    """
+    Reserve a key for this request inside the caller's transaction. Returns
+    False if another request already holds it; on PostgreSQL this waits for
+    that request's transaction to finish first, so its response can be replayed.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def store_response(key, status_code, data):
+    """Record the response for a claimed key; call in the same transaction as claim_key"""
+    IdempotencyKey.objects.filter(key=key).update(status_code=status_code, response=data)
+
+
+def purge_expired_keys():
+    """Delete stored responses past their TTL and return how many were removed"""
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
@@ -0,0 +1,231 @@
+"""
+Post-upload processing of incident photos
+
+Camera uploads are stored as-is by the request (in a content-addressed
+ImageBlob), then rewritten on a background thread: EXIF orientation is
+applied, the longest edge is capped at INCIDENT_IMAGE_MAX_EDGE, the result
+is re-encoded (WebP or progressive JPEG) and a fixed-size thumbnail is saved
+next to it. Identical uploads share the blob, so they are processed once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from .models import ImageBlob, IncidentImage, blob_path
+from .qr_cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# INCIDENT_IMAGE_FORMAT -> (Pillow format, file extension, content type)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+}
+
+
+def open_upright(file, longest_edge=None, shortest_edge=None):
+    """
+    Open an image and rotate it according to its EXIF orientation tag
+
+    When the caller only needs the longest (or shortest) edge to be at least
+    the given size, JPEGs are decoded at a reduced scale, which is much
+    faster than decoding the full photo and shrinking it afterwards.
+    """
+    image = Image.open(file)
+    if image.format == 'JPEG' and (longest_edge or shortest_edge):
+        scale = max(
+            longest_edge / max(image.size) if longest_edge else 0,
+            shortest_edge / min(image.size) if shortest_edge else 0,
+        )
+        if scale < 1:
+            image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+class UndecodableImage(Exception):
+    """A stored image file that Pillow cannot read"""
+
+
+def load_upright(file, **kwargs):
+    """Open and fully decode a stored image with open_upright, raising UndecodableImage if Pillow cannot read it"""
+    try:
+        with file.open('rb'):
+            image = open_upright(file, **kwargs)
+            image.load()
+    except FileNotFoundError:
+        raise
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError and truncated files are OSErrors; some corrupt headers raise SyntaxError
+        raise UndecodableImage(f'{file.name}: {e}') from e
+    return image
+
+
+def encode_image(image, image_format=None, quality=None):
+    """Encode an image for storage and return (bytes, file extension)"""
+    pil_format, extension, _ = IMAGE_FORMATS[image_format or settings.INCIDENT_IMAGE_FORMAT]
+    quality = quality or settings.INCIDENT_IMAGE_QUALITY
+
+    buffer = io.BytesIO()
+    if pil_format == 'JPEG':
+        if image.mode == 'RGBA':
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue(), extension
+
+
+def downscale(image, max_edge):
+    """Return the image shrunk so its longest edge is at most max_edge pixels"""
+    if max(image.size) <= max_edge:
+        return image
+    image = image.copy()
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return image
+
+
+def make_thumbnail(image, size=None):
+    """Return a size x size centre crop of the image for list screens"""
+    size = size or settings.INCIDENT_THUMBNAIL_SIZE
+    return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def process_image_blob(blob):
+    """
+    Normalise, downscale and re-encode an uploaded photo and generate its
+    thumbnail. Every IncidentImage sharing the blob is pointed at the result.
+    """
+    original = blob.file
+    image = load_upright(original, longest_edge=settings.INCIDENT_IMAGE_MAX_EDGE)
+
+    data, extension = encode_image(downscale(image, settings.INCIDENT_IMAGE_MAX_EDGE))
+    thumbnail_data, thumbnail_extension = encode_image(make_thumbnail(image))
+
+    storage = original.storage
+    old_name = original.name
+    image_name = storage.save(blob_path(blob.sha256, 'image' + extension), ContentFile(data))
+    thumbnail_name = storage.save(blob_path(blob.sha256, 'thumbnail' + thumbnail_extension), ContentFile(thumbnail_data))
+    processed_at = timezone.now()
+    with transaction.atomic():
+        # Locking the blob keeps images attached concurrently from copying the old file name
+        ImageBlob.objects.select_for_update().filter(pk=blob.pk).update(
+            file=image_name, thumbnail=thumbnail_name, processed_at=processed_at,
+        )
+        # update() instead of save() so a concurrent caption edit is not overwritten
+        IncidentImage.objects.filter(blob=blob).update(
+            image=image_name, thumbnail=thumbnail_name, processed_at=processed_at,
+        )
+    if old_name != image_name:
+        storage.delete(old_name)
+        delete_variants(old_name, storage)
+    return blob
+
+
+def variant_name(image_name, width):
+    """Return the storage name of an image's resized variant, stored next to the image"""
+    stem = os.path.splitext(image_name)[0]
+    return f'{stem}.w{width}{IMAGE_FORMATS[settings.INCIDENT_IMAGE_FORMAT][1]}'
+
+
+def variant_etag(incident_image, width):
+    """Return a strong ETag for an image's variant, changing whenever the image is (re-)processed"""
+    parts = [variant_name(incident_image.image.name, width), str(incident_image.processed_at)]
+    return '"%s"' % hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def delete_variants(image_name, storage):
+    """Delete every resized variant generated for an image"""
+    for width in settings.INCIDENT_IMAGE_VARIANT_WIDTHS:
+        name = variant_name(image_name, width)
+        if storage.exists(name):
+            storage.delete(name)
+
+
+def render_variant(incident_image, width):
+    """Return the image resized to the given width (never enlarged) as encoded bytes"""
+    image = load_upright(incident_image.image, shortest_edge=width)
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+    return encode_image(image)[0]
+
+
+_variant_flight = SingleFlight()
+
+
+def get_variant(incident_image, width):
+    """
+    Return the storage name of an image's variant at a whitelisted width,
+    generating and persisting it on first use. Concurrent requests for the
+    same variant share a single render.
+    """
+    storage = incident_image.image.storage
+    name = variant_name(incident_image.image.name, width)
+    if storage.exists(name):
+        return name
+
+    def generate():
+        if storage.exists(name):
+            return name
+        saved = storage.save(name, ContentFile(render_variant(incident_image, width)))
+        if saved != name:
+            # Another process stored the same variant first; keep theirs
+            storage.delete(saved)
+        return name
+
+    return _variant_flight.do(name, generate)
+
+
+def process_pending_images(image_ids=None):
+    """
+    Process the blobs behind the given (or all) incident images that have not
+    been processed yet. Blobs that cannot be decoded are marked failed and
+    skipped from then on; other errors are left to the next run.
+    """
+    pending = ImageBlob.objects.pending()
+    if image_ids is not None:
+        pending = pending.filter(images__pk__in=image_ids).distinct()
+
+    processed = 0
+    for blob in pending.iterator():
+        try:
+            process_image_blob(blob)
+            processed += 1
+        except UndecodableImage as e:
+            ImageBlob.objects.filter(pk=blob.pk).update(failed_at=timezone.now())
+            logger.error(f"Image blob {blob.pk} cannot be decoded and will not be retried: {e}")
+        except Exception as e:
+            logger.error(f"Processing image blob {blob.pk} failed: {e}")
+    return processed
+
+
+_process_executor = None
+_process_executor_lock = threading.Lock()
+
+
+def _process(image_ids):
+    try:
+        process_pending_images(image_ids)
+    finally:
+        close_old_connections()
+
+
+def process_images_in_background(image_ids):
+    """Process uploaded images on a background thread, off the request path"""
+    global _process_executor
+    with _process_executor_lock:
+        if _process_executor is None:
+            _process_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='incident-images')
+    return _process_executor.submit(_process, list(image_ids))
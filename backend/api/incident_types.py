@@ -0,0 +1,104 @@
+"""
+In-memory registry of each site's incident types
+
+Submissions look incident types up by (site, name) and then follow the
+type from the incident, its serializer and its notification. The registry
+loads a site's types with one query and serves them from memory after that.
+Model signals drop a site's entry when one of its types is saved or
+deleted, and entries also expire after INCIDENT_TYPE_CACHE_TTL seconds so
+changes made in other worker processes are picked up.
+
+Only sites that have incident types are kept, so IDs of unknown sites cost
+a query but no memory. A name missing from a loaded site triggers one
+reload, in case another worker just created it, and is then remembered as
+missing until the entry expires; at most MAX_MISSES names are remembered
+per site, and past that every unknown name is a miss without a query.
+"""
+from django.conf import settings
+import threading
+import time
+import uuid
+
+from .models import IncidentType
+
+
+MAX_MISSES = 100
+
+
+class IncidentTypeRegistry:
+    """Resolve incident types by (site, name) or ID without a query per submission"""
+
+    def __init__(self):
+        self._sites = {}   # site ID -> (loaded at, {name: incident type}, names known to be missing)
+        self._by_id = {}   # incident type ID -> incident type
+        self._lock = threading.Lock()
+
+    def _load(self, site_id, misses=()):
+        incident_types = {incident_type.name: incident_type for incident_type in IncidentType.objects.filter(site_id=site_id)}
+        with self._lock:
+            self._forget(site_id)
+            if incident_types:
+                self._sites[site_id] = (time.monotonic(), incident_types, set(misses) - incident_types.keys())
+                self._by_id.update((incident_type.pk, incident_type) for incident_type in incident_types.values())
+        return incident_types
+
+    def _forget(self, site_id):
+        entry = self._sites.pop(site_id, None)
+        if entry is not None:
+            for incident_type in entry[1].values():
+                self._by_id.pop(incident_type.pk, None)
+
+    def _site_entry(self, site_id):
+        """Return the (loaded at, types, misses) entry of a site, loading it if needed; None if it has no types"""
+        entry = self._sites.get(site_id)
+        if entry is None or time.monotonic() - entry[0] > settings.INCIDENT_TYPE_CACHE_TTL:
+            self._load(site_id)
+            entry = self._sites.get(site_id)
+        return entry
+
+    def _site_types(self, site_id):
+        entry = self._site_entry(site_id)
+        return entry[1] if entry is not None else {}
+
+    def resolve(self, site_id, name):
+        """Return a site's incident type with the given name, or None if there is none"""
+        try:
+            site_id = uuid.UUID(str(site_id))
+        except ValueError:
+            return None
+        entry = self._site_entry(site_id)
+        if entry is None or not name:
+            return None
+        loaded_at, incident_types, misses = entry
+        incident_type = incident_types.get(name)
+        if incident_type is None and name not in misses and len(misses) < MAX_MISSES:
+            # Possibly created by another worker since the site was loaded
+            incident_type = self._load(site_id, misses | {name}).get(name)
+        return incident_type
+
+    def get(self, pk):
+        """Return the incident type with the given ID, or None if there is none"""
+        try:
+            pk = uuid.UUID(str(pk))
+        except ValueError:
+            return None
+        incident_type = self._by_id.get(pk)
+        if incident_type is not None:
+            # Reloads the site if its entry expired, which may drop or replace this type
+            self._site_types(incident_type.site_id)
+            incident_type = self._by_id.get(pk)
+            if incident_type is not None:
+                return incident_type
+        site_id = IncidentType.objects.filter(pk=pk).values_list('site_id', flat=True).first()
+        if site_id is None:
+            return None
+        self._load(site_id)
+        return self._by_id.get(pk)
+
+    def invalidate(self, site_id):
+        """Forget a site's incident types; they are reloaded on next use"""
+        with self._lock:
+            self._forget(site_id)
+
+
+incident_types = IncidentTypeRegistry()
@@ -0,0 +1,336 @@
+"""
+Asyncio SMTP email backend with a connection pool
+
+Enable with EMAIL_BACKEND = 'api.mail_backends.AsyncSMTPEmailBackend'. It
+reads the same EMAIL_HOST / EMAIL_PORT / EMAIL_HOST_USER / EMAIL_HOST_PASSWORD /
+EMAIL_USE_TLS / EMAIL_USE_SSL / EMAIL_TIMEOUT settings as Django's SMTP
+backend, plus EMAIL_POOL_SIZE: the number of authenticated connections kept
+open, which is also the cap on messages in flight at once.
+
+Messages are spread over the pool concurrently, and on servers that
+advertise PIPELINING (RFC 2920) the MAIL, RCPT and DATA commands of each
+message go out in a single round trip. Errors are raised as the standard
+smtplib exceptions, so code written against Django's SMTP backend keeps
+working.
+"""
+import asyncio
+import base64
+import smtplib
+import ssl
+import threading
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import sanitize_address
+from django.core.mail.utils import DNS_NAME
+
+
+class AsyncSMTPConnection:
+    """One SMTP session over asyncio streams"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False, use_ssl=False,
+                 timeout=None, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.extensions = {}
+        self._reader = None
+        self._writer = None
+        self._plain_writer = None
+
+    async def _read_reply(self):
+        """Read one (possibly multi-line) reply and return (code, text)"""
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            if not line:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            lines.append(line[4:].rstrip(b'\r\n'))
+            if line[3:4] != b'-':
+                return int(line[:3]), b'\n'.join(lines)
+
+    async def command(self, line, expected=(250,)):
+        """Send a command and return its reply text, raising if the code is unexpected"""
+        self._writer.write(line.encode('utf-8') + b'\r\n')
+        await self._writer.drain()
+        code, text = await self._read_reply()
+        if code not in expected:
+            raise smtplib.SMTPResponseException(code, text)
+        return text
+
+    async def _ehlo(self):
+        text = await self.command(f'EHLO {DNS_NAME}')
+        self.extensions = {}
+        for line in text.decode('utf-8', 'replace').split('\n')[1:]:
+            keyword, _, params = line.partition(' ')
+            self.extensions[keyword.upper()] = params
+
+    async def connect(self):
+        """Open the connection, negotiate TLS and log in"""
+        context = self.ssl_context or ssl.create_default_context()
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context if self.use_ssl else None),
+            self.timeout,
+        )
+        code, text = await self._read_reply()
+        if code != 220:
+            raise smtplib.SMTPConnectError(code, text)
+        await self._ehlo()
+
+        if self.use_tls:
+            await self.command('STARTTLS', expected=(220,))
+            await self._start_tls(context)
+            await self._ehlo()
+
+        if self.username and self.password:
+            await self._login()
+
+    async def _start_tls(self, context):
+        """Upgrade the open connection to TLS after a successful STARTTLS"""
+        if hasattr(self._writer, 'start_tls'):
+            await asyncio.wait_for(self._writer.start_tls(context, server_hostname=self.host), self.timeout)
+            return
+        # Python < 3.11: wrap the transport with loop.start_tls() and write through a new
+        # StreamWriter; the reader keeps receiving the decrypted stream through the same protocol
+        loop = asyncio.get_running_loop()
+        transport = self._writer.transport
+        protocol = transport.get_protocol()
+        await self._writer.drain()
+        tls_transport = await asyncio.wait_for(
+            loop.start_tls(transport, protocol, context, server_hostname=self.host),
+            self.timeout,
+        )
+        # Keep the plain writer referenced: dropping it would close the transport underneath
+        self._plain_writer = self._writer
+        self._writer = asyncio.StreamWriter(tls_transport, protocol, self._reader, loop)
+
+    async def _login(self):
+        mechanisms = self.extensions.get('AUTH', '').upper().split()
+        try:
+            if 'PLAIN' in mechanisms or not mechanisms:
+                token = base64.b64encode(f'\0{self.username}\0{self.password}'.encode('utf-8')).decode('ascii')
+                await self.command(f'AUTH PLAIN {token}', expected=(235,))
+            else:
+                await self.command('AUTH LOGIN', expected=(334,))
+                await self.command(base64.b64encode(self.username.encode('utf-8')).decode('ascii'), expected=(334,))
+                await self.command(base64.b64encode(self.password.encode('utf-8')).decode('ascii'), expected=(235,))
+        except smtplib.SMTPResponseException as e:
+            raise smtplib.SMTPAuthenticationError(e.smtp_code, e.smtp_error)
+
+    async def _exchange(self, lines):
+        """Send commands and return their replies, in one round trip if the server pipelines"""
+        if 'PIPELINING' in self.extensions:
+            self._writer.write(''.join(line + '\r\n' for line in lines).encode('utf-8'))
+            await self._writer.drain()
+            return [await self._read_reply() for _ in lines]
+        replies = []
+        for line in lines:
+            self._writer.write(line.encode('utf-8') + b'\r\n')
+            await self._writer.drain()
+            replies.append(await self._read_reply())
+        return replies
+
+    async def sendmail(self, from_addr, recipients, data):
+        """
+        Send one message and return the refused recipients, like smtplib's sendmail()
+        `data` is the message as bytes with CRLF line endings
+        """
+        envelope = [f'MAIL FROM:<{from_addr}>'] + [f'RCPT TO:<{recipient}>' for recipient in recipients]
+        pipelined = 'PIPELINING' in self.extensions
+        replies = await self._exchange(envelope + ['DATA'] if pipelined else envelope)
+
+        mail_code, mail_text = replies[0]
+        refused = {
+            recipient: reply
+            for recipient, reply in zip(recipients, replies[1:len(envelope)])
+            if reply[0] not in (250, 251)
+        }
+        accepted = mail_code == 250 and len(refused) < len(recipients)
+        if pipelined:
+            data_code, data_text = replies[-1]
+        elif accepted:
+            data_code, data_text = (await self._exchange(['DATA']))[0]
+        else:
+            data_code, data_text = None, b''
+
+        if not accepted:
+            if data_code == 354:
+                # Some pipelining servers accept DATA without a valid recipient; end the empty message
+                self._writer.write(b'.\r\n')
+                await self._writer.drain()
+                await self._read_reply()
+            await self.command('RSET')
+            if mail_code != 250:
+                raise smtplib.SMTPSenderRefused(mail_code, mail_text, from_addr)
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if data_code != 354:
+            await self.command('RSET')
+            raise smtplib.SMTPDataError(data_code, data_text)
+
+        self._writer.write(self._dot_stuff(data) + b'.\r\n')
+        await self._writer.drain()
+        code, text = await self._read_reply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, text)
+        return refused
+
+    @staticmethod
+    def _dot_stuff(data):
+        if not data.endswith(b'\r\n'):
+            data += b'\r\n'
+        data = data.replace(b'\r\n.', b'\r\n..')
+        if data.startswith(b'.'):
+            data = b'.' + data
+        return data
+
+    async def quit(self):
+        """Close the session politely, ignoring errors from an already broken connection"""
+        if self._writer is None:
+            return
+        try:
+            await self.command('QUIT', expected=(221,))
+        except Exception:
+            pass
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+        self._writer = self._reader = self._plain_writer = None
+
+
+class SMTPConnectionPool:
+    """At most `size` SMTP connections, opened lazily and reused between messages"""
+
+    def __init__(self, size, factory):
+        self.size = size
+        self.factory = factory
+        self._idle = []
+        self._slots = None
+
+    async def send(self, from_addr, recipients, data):
+        """Send a message over a pooled connection, waiting for a free one if all are busy"""
+        if self._slots is None:
+            # Created on the pool's own loop: before Python 3.10 a Semaphore binds to
+            # the current thread's event loop when it is constructed
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = self.factory()
+                    await connection.connect()
+                await connection.sendmail(from_addr, recipients, data)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused):
+                # Rejected message, healthy connection
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                if connection is not None:
+                    await connection.quit()
+                raise
+            self._idle.append(connection)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(connection.quit() for connection in idle))
+
+
+class AsyncSMTPEmailBackend(BaseEmailBackend):
+    """
+    Django email backend delivering over pooled asyncio SMTP connections
+
+    The pool runs on a private event loop thread, so it can be used from
+    ordinary synchronous code and stays open between send_messages() calls
+    until close().
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, use_ssl=None,
+                 timeout=None, pool_size=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = settings.EMAIL_HOST_USER if username is None else username
+        self.password = settings.EMAIL_HOST_PASSWORD if password is None else password
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = settings.EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = settings.EMAIL_TIMEOUT if timeout is None else timeout
+        self.pool_size = pool_size or settings.EMAIL_POOL_SIZE
+        if self.use_ssl and self.use_tls:
+            raise ValueError('EMAIL_USE_TLS/EMAIL_USE_SSL are mutually exclusive, so only set one of those settings to True.')
+        self._lock = threading.RLock()
+        self._loop = None
+        self._thread = None
+        self._pool = None
+
+    def _new_connection(self):
+        return AsyncSMTPConnection(
+            self.host, self.port, self.username, self.password,
+            use_tls=self.use_tls, use_ssl=self.use_ssl, timeout=self.timeout,
+        )
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def open(self):
+        """Start the event loop and pool; returns True if a new pool was started"""
+        with self._lock:
+            if self._loop is not None:
+                return False
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='smtp-pool', daemon=True)
+            self._thread.start()
+            self._pool = SMTPConnectionPool(self.pool_size, self._new_connection)
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            try:
+                self._run(self._pool.close())
+            except Exception:
+                if not self.fail_silently:
+                    raise
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = self._thread = self._pool = None
+
+    def send_messages(self, email_messages):
+        """Send messages concurrently over the pool and return how many were sent"""
+        email_messages = [message for message in email_messages if message.recipients()]
+        if not email_messages:
+            return 0
+
+        with self._lock:
+            new_pool = self.open()
+            try:
+                results = self._run(self._send_all(email_messages))
+            finally:
+                if new_pool:
+                    self.close()
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and not self.fail_silently:
+            raise errors[0]
+        return len(results) - len(errors)
+
+    async def _send_all(self, email_messages):
+        return await asyncio.gather(
+            *(self._send(message) for message in email_messages),
+            return_exceptions=True,
+        )
+
+    async def _send(self, email_message):
+        encoding = email_message.encoding or settings.DEFAULT_CHARSET
+        from_email = sanitize_address(email_message.from_email, encoding)
+        recipients = [sanitize_address(address, encoding) for address in email_message.recipients()]
+        data = email_message.message().as_bytes(linesep='\r\n')
+        await self._pool.send(from_email, recipients, data)
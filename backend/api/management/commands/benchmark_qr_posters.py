@@ -0,0 +1,119 @@
+from django.core.management.base import BaseCommand
+from api.qr import (
+    QR_BORDER, choose_qr_encoding, compute_layout, make_qr_matrix, render_poster, render_qr_modules
+)
+from api.qr_vector import render_poster_pdf, render_poster_svg
+import numpy as np
+import qrcode
+import time
+
+
+SAMPLE_QR_URL = 'https://hse.hexaclimate.com/hex/s/K7QM2X'
+
+# The UUID-based public URL QR codes encoded before short links
+SAMPLE_LONG_QR_URL = 'https://hse.hexaclimate.com/public/3f2b8c1e-9d4a-4f7e-b6a2-1c5d8e9f0a7b/'
+
+ERROR_CORRECTION_NAMES = {
+    qrcode.constants.ERROR_CORRECT_L: 'L',
+    qrcode.constants.ERROR_CORRECT_M: 'M',
+    qrcode.constants.ERROR_CORRECT_Q: 'Q',
+    qrcode.constants.ERROR_CORRECT_H: 'H',
+}
+
+SAMPLE_SITE_NAMES = [
+    'Short Site',
+    'Hexa Climate Factory - Mumbai',
+    'Hexa Climate Manufacturing Plant - Pune Industrial Area',
+    'Extremely Long Site Name That Keeps Going Well Past The Width Of The Poster Header',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark QR poster rendering (no caching involved)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Renders per site name (default: 50)',
+        )
+
+    def timeit(self, func, iterations):
+        """Return the mean milliseconds per call of func()"""
+        func()  # warm up fonts, logo and imports
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) * 1000 / iterations
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.benchmark_layout(iterations)
+        self.benchmark_modules(iterations)
+        self.benchmark_vector(iterations)
+        self.benchmark_payload(iterations)
+
+    def benchmark_layout(self, iterations):
+        self.stdout.write(f'Poster layout and render times ({iterations} iterations per name)')
+
+        for site_name in SAMPLE_SITE_NAMES:
+            layout_ms = self.timeit(lambda: compute_layout(site_name), iterations)
+            render_ms = self.timeit(lambda: render_poster(site_name, SAMPLE_QR_URL), iterations)
+            width = compute_layout(site_name).width
+            self.stdout.write(
+                f'  {len(site_name):3d} chars, {width:4d}px wide: '
+                f'layout {layout_ms:6.3f} ms, full render {render_ms:6.2f} ms'
+            )
+
+    def benchmark_modules(self, iterations):
+        self.stdout.write(f'QR module rendering: qrcode PIL factory vs NumPy ({iterations} iterations)')
+
+        for box_size in (4, 8, 10, 16):
+            qr = qrcode.QRCode(
+                error_correction=qrcode.constants.ERROR_CORRECT_L,
+                box_size=box_size,
+                border=QR_BORDER,
+            )
+            qr.add_data(SAMPLE_QR_URL)
+            qr.make(fit=True)
+            matrix = qr.get_matrix()
+
+            # Both renderers must agree pixel for pixel before timing them
+            factory_pixels = np.asarray(qr.make_image(fill_color="black", back_color="white").convert('L'))
+            if not np.array_equal(factory_pixels, render_qr_modules(matrix, box_size)):
+                self.stdout.write(self.style.ERROR(f'  box_size {box_size}: outputs differ'))
+                continue
+
+            factory_ms = self.timeit(lambda: qr.make_image(fill_color="black", back_color="white"), iterations)
+            numpy_ms = self.timeit(lambda: render_qr_modules(matrix, box_size), iterations)
+            self.stdout.write(
+                f'  box_size {box_size:2d}: factory {factory_ms:6.3f} ms, '
+                f'numpy {numpy_ms:6.3f} ms ({factory_ms / numpy_ms:4.1f}x)'
+            )
+
+    def benchmark_vector(self, iterations):
+        self.stdout.write(f'Poster output formats ({iterations} iterations)')
+
+        site_name = SAMPLE_SITE_NAMES[1]
+        for label, render in (('png', render_poster), ('svg', render_poster_svg), ('pdf', render_poster_pdf)):
+            size = len(render(site_name, SAMPLE_QR_URL))
+            render_ms = self.timeit(lambda: render(site_name, SAMPLE_QR_URL), iterations)
+            self.stdout.write(f'  {label}: {render_ms:6.2f} ms, {size / 1024:5.1f} KB')
+
+    def benchmark_payload(self, iterations):
+        self.stdout.write(f'QR payload: UUID URL vs short link ({iterations} iterations)')
+
+        results = []
+        for label, url in (('uuid', SAMPLE_LONG_QR_URL), ('short', SAMPLE_QR_URL)):
+            version, error_correction = choose_qr_encoding(url)
+            modules = len(make_qr_matrix(url)) - 2 * QR_BORDER
+            encode_ms = self.timeit(lambda: make_qr_matrix(url), iterations)
+            results.append(modules * modules)
+            self.stdout.write(
+                f'  {label:5s} ({len(url):2d} chars): version {version}-{ERROR_CORRECTION_NAMES[error_correction]}, '
+                f'{modules}x{modules} modules, encode {encode_ms:6.2f} ms'
+            )
+
+        reduction = 100 * (1 - results[1] / results[0])
+        self.stdout.write(f'  module count reduced by {reduction:.0f}%')
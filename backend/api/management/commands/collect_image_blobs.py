@@ -0,0 +1,53 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+from api.models import ImageBlob, IncidentImage
+
+
+class Command(BaseCommand):
+    help = 'Fix image blob reference counts and delete blobs (and files) nothing refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sweep',
+            action='store_true',
+            help='Also delete files under incident_images/ that belong to no blob or image',
+        )
+
+    def handle(self, *args, **options):
+        miscounted = ImageBlob.objects.annotate(references=Count('images')).exclude(ref_count=F('references'))
+        fixed = 0
+        for blob in miscounted:
+            ImageBlob.objects.filter(pk=blob.pk).update(ref_count=blob.references)
+            fixed += 1
+        self.stdout.write(f'Corrected {fixed} reference counts')
+
+        orphans = ImageBlob.objects.filter(ref_count=0).values_list('sha256', flat=True)
+        collected = sum(ImageBlob.collect(sha256) for sha256 in list(orphans))
+        self.stdout.write(self.style.SUCCESS(f'✓ Collected {collected} unreferenced image blobs'))
+
+        if options['sweep']:
+            swept = self.sweep('incident_images')
+            self.stdout.write(self.style.SUCCESS(f'✓ Deleted {swept} stray files'))
+
+    def sweep(self, root):
+        """Delete files under root that are neither inside a blob directory nor used by an image"""
+        blob_directories = {blob.directory() for blob in ImageBlob.objects.only('sha256')}
+        used = set()
+        for image, thumbnail in IncidentImage.objects.values_list('image', 'thumbnail'):
+            used.update(name for name in (image, thumbnail) if name)
+
+        deleted = 0
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            if directory in blob_directories:
+                continue
+            subdirectories, files = default_storage.listdir(directory)
+            pending.extend(f'{directory}/{name}' for name in subdirectories)
+            for name in files:
+                path = f'{directory}/{name}'
+                if path not in used:
+                    default_storage.delete(path)
+                    deleted += 1
+        return deleted
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Site
+from api.qr import build_qr_url
+from api.qr_export import EXPORT_FORMATS, stream_export
+import time
+
+
+class Command(BaseCommand):
+    help = 'Export QR posters for many sites as a ZIP of PNGs or a multi-page PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write the export to')
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='zip',
+            help='Export format (default: zip)',
+        )
+        parser.add_argument(
+            '--site',
+            action='append',
+            dest='sites',
+            help='Only export this site ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of render processes (default: QR_EXPORT_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['sites']:
+            sites = sites.filter(id__in=options['sites'])
+
+        entries = [(site, build_qr_url(None, site)) for site in sites]
+        if not entries:
+            raise CommandError('No sites found to export')
+
+        self.stdout.write(f'Exporting {len(entries)} QR posters to {options["output"]}...')
+        started = time.perf_counter()
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in stream_export(entries, options['format'], workers=options['workers']):
+                output.write(chunk)
+                size += len(chunk)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Exported {len(entries)} posters ({size / 1024:.0f} KB) in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from api.images import process_pending_images
+from api.models import ImageBlob
+import time
+
+
+class Command(BaseCommand):
+    help = 'Downscale, re-encode and thumbnail incident images that have not been processed yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry images that previously failed to decode',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = ImageBlob.objects.filter(processed_at__isnull=True, failed_at__isnull=False).update(failed_at=None)
+            self.stdout.write(f'Retrying {retried} images that failed before')
+
+        pending = ImageBlob.objects.pending().count()
+        self.stdout.write(f'Processing {pending} incident images...')
+
+        started = time.perf_counter()
+        processed = process_pending_images()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Processed {processed} incident images in {elapsed:.2f}s'))
+        if processed < pending:
+            self.stdout.write(self.style.WARNING(f'✗ {pending - processed} images failed (see log)'))
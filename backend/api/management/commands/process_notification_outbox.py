@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.outbox import drain_outbox
+import time
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued incident notification emails, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the due notifications once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Notifications delivered per transaction (default: 50)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Seconds to sleep when nothing is due (default: NOTIFICATION_POLL_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] if options['interval'] is not None else settings.NOTIFICATION_POLL_INTERVAL
+        batch_size = options['batch_size']
+
+        if options['once']:
+            while self.drain(batch_size) >= batch_size:
+                pass
+            return
+
+        self.stdout.write(f'Processing notification outbox every {interval}s (Ctrl+C to stop)')
+        try:
+            while True:
+                # Keep going while batches come back full; sleep only once the backlog is drained
+                if self.drain(batch_size) < batch_size:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def drain(self, batch_size):
+        """Run one batch and return how many notifications it handled"""
+        close_old_connections()
+        sent, failed = drain_outbox(batch_size)
+        if sent:
+            self.stdout.write(self.style.SUCCESS(f'✓ Sent {sent} notifications'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'✗ {failed} deliveries failed (see log)'))
+        return sent + failed
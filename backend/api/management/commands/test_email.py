@@ -1,10 +1,11 @@
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
 from api.models import NotificationEmail
 from api.utils import send_incident_notification
 from api.models import Site, Incident
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,26 @@ class Command(BaseCommand):
             action='store_true',
             help='Test incident notification email',
         )
+        parser.add_argument(
+            '--benchmark',
+            action='store_true',
+            help='Compare delivery throughput of the stock SMTP backend and the async pooled backend',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=200,
+            help='Messages sent per backend by --benchmark (default: 200)',
+        )
+        parser.add_argument(
+            '--host',
+            help='SMTP host for --benchmark (default: EMAIL_HOST)',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            help='SMTP port for --benchmark (default: EMAIL_PORT)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting email functionality test...'))
@@ -32,11 +53,15 @@ class Command(BaseCommand):
         if options['test_notification']:
             self.test_notification_email()
         
-        if not options['test_smtp'] and not options['test_notification']:
-            self.stdout.write(self.style.WARNING('No test specified. Use --test-smtp or --test-notification'))
+        if options['benchmark']:
+            self.benchmark_backends(options['messages'], options['host'], options['port'])
+        
+        if not options['test_smtp'] and not options['test_notification'] and not options['benchmark']:
+            self.stdout.write(self.style.WARNING('No test specified. Use --test-smtp, --test-notification or --benchmark'))
             self.stdout.write('Available tests:')
             self.stdout.write('  --test-smtp: Test SMTP connection')
             self.stdout.write('  --test-notification: Test incident notification email')
+            self.stdout.write('  --benchmark: Compare SMTP backend throughput (e.g. against python -m aiosmtpd -n -l localhost:8025)')
 
     def test_smtp_connection(self):
         """Test SMTP connection if configured"""
@@ -99,4 +124,39 @@ class Command(BaseCommand):
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'✗ Test failed: {e}'))
-            self.stdout.write(self.style.WARNING('Email functionality will not break the main application')) 
\ No newline at end of file
+            self.stdout.write(self.style.WARNING('Email functionality will not break the main application')) 
+
+    def benchmark_backends(self, count, host=None, port=None):
+        """Send the same batch through each SMTP backend and report messages per second"""
+        host = host or settings.EMAIL_HOST
+        port = port or settings.EMAIL_PORT
+        self.stdout.write(f'Benchmarking SMTP delivery of {count} messages to {host}:{port}...')
+        
+        backends = [
+            ('stock smtp', 'django.core.mail.backends.smtp.EmailBackend'),
+            (f'async pool ({settings.EMAIL_POOL_SIZE})', 'api.mail_backends.AsyncSMTPEmailBackend'),
+        ]
+        for label, backend in backends:
+            messages = [
+                EmailMessage(
+                    subject=f'Benchmark message {number} - Hexa Climate Safety System',
+                    body='This is a benchmark email sent by test_email --benchmark.',
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[f'benchmark-{number}@example.com'],
+                )
+                for number in range(count)
+            ]
+            try:
+                # Both backends send the whole batch through one open()/close() session
+                connection = get_connection(backend, host=host, port=port)
+                started = time.perf_counter()
+                with connection:
+                    sent = connection.send_messages(messages)
+                elapsed = time.perf_counter() - started
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  ✗ {label}: {e}'))
+                continue
+            self.stdout.write(
+                f'  {label:16s}: {sent} sent in {elapsed:6.2f}s, {sent / elapsed:8.1f} messages/s'
+            )
+
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from api.models import Site
+from api.qr import build_qr_url
+from api.qr_export import iter_posters
+import time
+
+
+class Command(BaseCommand):
+    help = 'Pre-render QR posters into the poster cache (run after deploys)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site',
+            action='append',
+            dest='sites',
+            help='Only warm this site ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of render processes (default: QR_EXPORT_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['sites']:
+            sites = sites.filter(id__in=options['sites'])
+
+        entries = [(site, build_qr_url(None, site)) for site in sites]
+        self.stdout.write(f'Warming QR posters for {len(entries)} sites...')
+
+        started = time.perf_counter()
+        # iter_posters serves hits from the cache and writes every fresh render back to it
+        for _ in iter_posters(entries, workers=options['workers']):
+            pass
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Warmed {len(entries)} QR posters in {elapsed:.2f}s'))
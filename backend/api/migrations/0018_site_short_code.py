@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import secrets
+
+
+SHORT_CODE_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+SHORT_CODE_LENGTH = 6
+
+
+def populate_short_codes(apps, schema_editor):
+    """Give every existing site a unique short-link code"""
+    Site = apps.get_model('api', 'Site')
+    used = set()
+    for site in Site.objects.all():
+        short_code = None
+        while short_code is None or short_code in used:
+            short_code = ''.join(secrets.choice(SHORT_CODE_ALPHABET) for _ in range(SHORT_CODE_LENGTH))
+        used.add(short_code)
+        site.short_code = short_code
+        site.save(update_fields=['short_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_alter_emergencycontact_id_alter_incident_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="site",
+            name="short_code",
+            field=models.CharField(editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_short_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="site",
+            name="short_code",
+            field=models.CharField(editable=False, max_length=12, unique=True),
+        ),
+    ]
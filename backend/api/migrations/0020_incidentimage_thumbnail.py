@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentimage',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='incidentimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='incident_images/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+import os
+
+
+def move_images_into_blobs(apps, schema_editor):
+    """
+    Copy existing incident photos into content-addressed blobs. Rows with
+    identical files end up sharing one blob. The original files are left in
+    place, so a failed migration never leaves rows pointing at deleted files;
+    `collect_image_blobs --sweep` removes them once the migration has committed.
+    """
+    IncidentImage = apps.get_model('api', 'IncidentImage')
+    ImageBlob = apps.get_model('api', 'ImageBlob')
+
+    # Rows sharing a file name share the file, so each name is hashed and copied once
+    rows_by_name = defaultdict(list)
+    for image in IncidentImage.objects.filter(blob__isnull=True).exclude(image='').order_by('created_at'):
+        rows_by_name[image.image.name].append(image)
+
+    for name, images in rows_by_name.items():
+        if not default_storage.exists(name):
+            continue
+        digest = hashlib.sha256()
+        with default_storage.open(name, 'rb') as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        directory = f'incident_images/{sha256[:2]}/{sha256}'
+
+        blob = ImageBlob.objects.filter(pk=sha256).first()
+        if blob is None:
+            processed_at = next((image.processed_at for image in images if image.processed_at), None)
+            thumbnail = next((image.thumbnail.name for image in images if image.thumbnail.name), None)
+            copies = {}
+            for field, source_name in (('image', name), ('thumbnail', thumbnail)):
+                if source_name and default_storage.exists(source_name):
+                    prefix = 'thumbnail' if field == 'thumbnail' else ('image' if processed_at else 'upload')
+                    with default_storage.open(source_name, 'rb') as source:
+                        copies[field] = default_storage.save(f'{directory}/{prefix}{os.path.splitext(source_name)[1].lower()}', source)
+            blob = ImageBlob.objects.create(
+                sha256=sha256,
+                file=copies['image'],
+                thumbnail=copies.get('thumbnail'),
+                size=default_storage.size(name),
+                processed_at=processed_at,
+            )
+
+        IncidentImage.objects.filter(pk__in=[image.pk for image in images]).update(
+            blob=blob,
+            image=blob.file.name,
+            thumbnail=blob.thumbnail.name or None,
+            processed_at=blob.processed_at,
+        )
+        ImageBlob.objects.filter(pk=sha256).update(ref_count=models.F('ref_count') + len(images))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_incidentimage_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file', models.ImageField(upload_to='incident_images/')),
+                ('thumbnail', models.ImageField(blank=True, null=True, upload_to='incident_images/')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='incidentimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='api.imageblob'),
+        ),
+        migrations.RunPython(move_images_into_blobs, migrations.RunPython.noop),
+    ]
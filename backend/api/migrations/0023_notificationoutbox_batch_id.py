@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='batch_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_notificationoutbox_batch_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-created_at', 'id'], name='api_incident_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_incident_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['site', '-created_at', 'id'], name='api_incident_site_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['site', 'status', '-created_at', 'id'], name='api_incident_site_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['site', 'criticality', '-created_at', 'id'], name='api_incident_site_crit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['status', '-created_at', 'id'], name='api_incident_status_idx'),
+        ),
+    ]
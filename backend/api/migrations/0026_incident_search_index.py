@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:20
+
+from django.db import migrations
+
+# The statements are kept here rather than imported from api.search, so later
+# changes to the app cannot alter what this migration does
+INSTALL = {
+    'postgresql': [
+        """
+        ALTER TABLE api_incident ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(description, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(reporter_name, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX api_incident_search_idx ON api_incident USING gin (search_vector)",
+    ],
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE api_incident_fts USING fts5(
+            description, reporter_name,
+            content='api_incident', content_rowid='rowid', tokenize='porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER api_incident_fts_insert AFTER INSERT ON api_incident BEGIN
+            INSERT INTO api_incident_fts(rowid, description, reporter_name)
+            VALUES (new.rowid, new.description, new.reporter_name);
+        END
+        """,
+        """
+        CREATE TRIGGER api_incident_fts_delete AFTER DELETE ON api_incident BEGIN
+            INSERT INTO api_incident_fts(api_incident_fts, rowid, description, reporter_name)
+            VALUES ('delete', old.rowid, old.description, old.reporter_name);
+        END
+        """,
+        """
+        CREATE TRIGGER api_incident_fts_update AFTER UPDATE OF description, reporter_name ON api_incident BEGIN
+            INSERT INTO api_incident_fts(api_incident_fts, rowid, description, reporter_name)
+            VALUES ('delete', old.rowid, old.description, old.reporter_name);
+            INSERT INTO api_incident_fts(rowid, description, reporter_name)
+            VALUES (new.rowid, new.description, new.reporter_name);
+        END
+        """,
+        "INSERT INTO api_incident_fts(api_incident_fts) VALUES ('rebuild')",
+    ],
+}
+UNINSTALL = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS api_incident_search_idx",
+        "ALTER TABLE api_incident DROP COLUMN IF EXISTS search_vector",
+    ],
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS api_incident_fts_insert",
+        "DROP TRIGGER IF EXISTS api_incident_fts_delete",
+        "DROP TRIGGER IF EXISTS api_incident_fts_update",
+        "DROP TABLE IF EXISTS api_incident_fts",
+    ],
+}
+
+
+def install(apps, schema_editor):
+    """Create the search column or table, its index and the triggers feeding it"""
+    for statement in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def uninstall(apps, schema_editor):
+    for statement in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_incident_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
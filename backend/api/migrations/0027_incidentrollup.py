@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions
+import uuid
+
+
+def build_rollups(apps, schema_editor):
+    """Count the incidents that already exist"""
+    Incident = apps.get_model('api', 'Incident')
+    IncidentRollup = apps.get_model('api', 'IncidentRollup')
+    groups = (
+        Incident.objects.order_by()
+        .annotate(day=models.functions.TruncDate('created_at'), level=models.functions.Coalesce('criticality', models.Value('')))
+        .values('site_id', 'incident_type_id', 'level', 'status', 'day')
+        .annotate(count=models.Count('id'))
+    )
+    IncidentRollup.objects.bulk_create([
+        IncidentRollup(
+            site_id=group['site_id'],
+            incident_type_id=group['incident_type_id'],
+            criticality=group['level'],
+            status=group['status'],
+            day=group['day'],
+            count=group['count'],
+        )
+        for group in groups.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_incident_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('criticality', models.CharField(blank=True, default='', max_length=10)),
+                ('status', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('incident_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='api.incidenttype')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='api.site')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='api_rollup_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='incidentrollup',
+            constraint=models.UniqueConstraint(fields=('site', 'incident_type', 'criticality', 'status', 'day'), name='api_rollup_key_unique'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_incidentrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
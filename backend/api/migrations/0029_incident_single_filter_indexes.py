@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_imageblob_failed_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['criticality', '-created_at', 'id'], name='api_incident_crit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['incident_type', '-created_at', 'id'], name='api_incident_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['is_anonymous', '-created_at', 'id'], name='api_incident_anonymous_idx'),
+        ),
+    ]
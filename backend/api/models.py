@@ -1,16 +1,45 @@
 from django.db import models
 from django.core.validators import RegexValidator
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import hashlib
+import os
+import secrets
 import uuid
 
 
+# Unambiguous upper-case letters and digits (no 0/O, 1/I/L) for short-link codes
+SHORT_CODE_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+SHORT_CODE_LENGTH = 6
+
+
+def generate_short_code():
+    """Return a random short-link code"""
+    return ''.join(secrets.choice(SHORT_CODE_ALPHABET) for _ in range(SHORT_CODE_LENGTH))
+
+
 class Site(models.Model):
     """Model for sites/locations"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=True)
     name = models.CharField(max_length=200)
     address = models.TextField()
+    # Compact code used in QR short links (/hex/s/<short_code>) instead of the UUID
+    short_code = models.CharField(max_length=12, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        if not self.short_code:
+            short_code = generate_short_code()
+            while Site.objects.filter(short_code=short_code).exists():
+                short_code = generate_short_code()
+            self.short_code = short_code
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -52,14 +81,138 @@ class EmergencyContact(models.Model):
         ordering = ['name']
 
 
+def blob_path(sha256, name):
+    """Return the storage path of a file belonging to a content-addressed image blob"""
+    return f'incident_images/{sha256[:2]}/{sha256}/{name}'
+
+
+def file_sha256(file):
+    """Return the SHA-256 of an uploaded file, reusing the digest computed while it streamed in"""
+    sha256 = getattr(file, 'sha256', None)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        file.seek(0)
+        sha256 = digest.hexdigest()
+    return sha256
+
+
+class ImageBlobQuerySet(models.QuerySet):
+    def pending(self):
+        """Blobs still waiting to be processed, leaving out those that failed to decode"""
+        return self.filter(processed_at__isnull=True, failed_at__isnull=True)
+
+
+class ImageBlob(models.Model):
+    """
+    Content-addressed incident photo shared by every IncidentImage whose
+    upload had the same SHA-256. ref_count tracks those images; a blob whose
+    count drops to zero is collected together with its files.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.ImageField(upload_to='incident_images/')
+    thumbnail = models.ImageField(upload_to='incident_images/', blank=True, null=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    # Set once the upload has been downscaled, re-encoded and thumbnailed
+    processed_at = models.DateTimeField(blank=True, null=True)
+    # Set when the upload turned out not to be decodable; such blobs are not retried
+    failed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+    @classmethod
+    def acquire(cls, file):
+        """
+        Return the blob holding an uploaded file's content, taking a reference
+        to it. Content that is already stored costs no extra disk space or writes.
+        """
+        sha256 = file_sha256(file)
+        with transaction.atomic():
+            # The row lock taken here also waits out a concurrent garbage collection of the blob
+            if cls.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1):
+                return cls.objects.get(pk=sha256)
+
+            extension = os.path.splitext(file.name)[1].lower() or '.jpg'
+            name = blob_path(sha256, 'upload' + extension)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, file)
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(sha256=sha256, file=name, size=file.size, ref_count=1)
+            except IntegrityError:
+                # A concurrent upload of the same content created the blob first
+                cls.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1)
+                return cls.objects.get(pk=sha256)
+
+    @classmethod
+    def release(cls, sha256):
+        """Drop one reference to a blob and collect it after commit if that was the last one"""
+        cls.objects.filter(pk=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        transaction.on_commit(lambda: cls.collect(sha256))
+
+    @classmethod
+    def collect(cls, sha256):
+        """Delete a blob and its files if nothing references it; returns True if it was deleted"""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=sha256, ref_count=0).first()
+            if blob is None:
+                return False
+            # Files go first, while the row lock holds off uploads of the same content
+            blob.delete_files()
+            blob.delete()
+        return True
+
+    def directory(self):
+        """Return the storage directory holding this blob's upload, processed image, thumbnail and variants"""
+        return blob_path(self.sha256, '').rstrip('/')
+
+    def delete_files(self):
+        storage = self.file.storage
+        directory = self.directory()
+        if storage.exists(directory):
+            for name in storage.listdir(directory)[1]:
+                storage.delete(f'{directory}/{name}')
+
+    class Meta:
+        ordering = ['-created_at']
+
+
 class IncidentImage(models.Model):
     """Model for incident images"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=True)
     incident = models.ForeignKey('Incident', on_delete=models.CASCADE, related_name='images')
+    # Shared content-addressed file; image/thumbnail/processed_at mirror the blob's
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, related_name='images', blank=True, null=True, editable=False)
     image = models.ImageField(upload_to='incident_images/')
+    # Small fixed-size preview for list screens, generated by api.images after upload
+    thumbnail = models.ImageField(upload_to='incident_images/thumbnails/', blank=True, null=True)
     caption = models.CharField(max_length=200, blank=True, null=True)
+    # Set once the upload has been downscaled, re-encoded and thumbnailed
+    processed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # A fresh upload is stored content-addressed, sharing the file with identical uploads
+        previous_blob_id = self.blob_id
+        if self.image and not self.image._committed:
+            self.use_blob(ImageBlob.acquire(self.image.file))
+        super().save(*args, **kwargs)
+        if previous_blob_id and previous_blob_id != self.blob_id:
+            ImageBlob.release(previous_blob_id)
+
+    def use_blob(self, blob):
+        """Point this image at an acquired blob's files"""
+        self.blob = blob
+        self.image = blob.file.name
+        self.thumbnail = blob.thumbnail.name or None
+        self.processed_at = blob.processed_at
+
     def __str__(self):
         return f"Image for {self.incident}"
 
@@ -90,6 +243,28 @@ class IncidentType(models.Model):
         unique_together = ['site', 'name']
 
 
+class IncidentQuerySet(models.QuerySet):
+    def with_image_count(self):
+        """Annotate the number of images, read back by Incident.image_count"""
+        # A correlated subquery rather than a JOIN + GROUP BY, so ordered pages can still walk an index
+        image_count = (
+            IncidentImage.objects.filter(incident=OuterRef('pk'))
+            .order_by().values('incident').annotate(count=Count('pk')).values('count')
+        )
+        return self.annotate(annotated_image_count=Coalesce(Subquery(image_count), 0))
+
+    def with_details(self):
+        """
+        Load the site, incident type and images that incident listings show,
+        and count the images in SQL, so a page costs a fixed number of queries
+        """
+        return (
+            self.select_related('site', 'incident_type')
+            .prefetch_related('images')
+            .with_image_count()
+        )
+
+
 class Incident(models.Model):
     """Model for incident reports"""
     CRITICALITY_LEVELS = [
@@ -121,11 +296,26 @@ class Incident(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = IncidentQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
-        # Set default criticality for incident types that don't require criticality
-        if not self.incident_type.requires_criticality and not self.criticality:
+        self.set_default_criticality()
+        # The rollup signals (api.signals) adjust IncidentRollup in the same transaction as the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def set_default_criticality(self):
+        """Set default criticality for incident types that don't require criticality"""
+        if self.criticality:
+            return
+        if Incident.incident_type.is_cached(self):
+            incident_type = self.incident_type
+        else:
+            # Avoid a query for incidents built from an incident_type_id
+            from .incident_types import incident_types
+            incident_type = incident_types.get(self.incident_type_id) or self.incident_type
+        if not incident_type.requires_criticality:
             self.criticality = 'low'
-        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.incident_type.display_name} - {self.site.name} ({self.created_at.strftime('%Y-%m-%d')})"
@@ -133,7 +323,103 @@ class Incident(models.Model):
     @property
     def image_count(self):
         """Return the number of images for this incident"""
+        if hasattr(self, 'annotated_image_count'):
+            return self.annotated_image_count
         return self.images.count()
 
     class Meta:
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination order, see api.pagination
+            models.Index(fields=['-created_at', 'id'], name='api_incident_created_idx'),
+            # List filters (api.filters), each ending in the pagination order
+            models.Index(fields=['site', '-created_at', 'id'], name='api_incident_site_idx'),
+            models.Index(fields=['site', 'status', '-created_at', 'id'], name='api_incident_site_status_idx'),
+            models.Index(fields=['site', 'criticality', '-created_at', 'id'], name='api_incident_site_crit_idx'),
+            models.Index(fields=['status', '-created_at', 'id'], name='api_incident_status_idx'),
+            models.Index(fields=['criticality', '-created_at', 'id'], name='api_incident_crit_idx'),
+            models.Index(fields=['incident_type', '-created_at', 'id'], name='api_incident_type_idx'),
+            models.Index(fields=['is_anonymous', '-created_at', 'id'], name='api_incident_anonymous_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    Pending incident notification, written in the same transaction as the
+    incident and delivered by the process_notification_outbox worker
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=True)
+    incident = models.ForeignKey(Incident, on_delete=models.CASCADE, related_name='notifications')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    # Incidents submitted together share a batch and are emailed as one summary
+    batch_id = models.UUIDField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Notification for {self.incident_id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='api_outbox_due_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a request sent with an Idempotency-Key header, replayed
+    to retries of the same request until it expires
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    # SHA-256 of the request fields and files; a key reused for a different request is refused
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class IncidentRollup(models.Model):
+    """
+    Number of incidents per site, incident type, criticality, status and
+    creation day, kept up to date by api.rollups as incidents change
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=True)
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='incident_rollups')
+    incident_type = models.ForeignKey(IncidentType, on_delete=models.CASCADE, related_name='incident_rollups')
+    # '' for incidents without a criticality, so the unique constraint also covers them
+    criticality = models.CharField(max_length=10, blank=True, default='')
+    status = models.CharField(max_length=20)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.site_id} {self.incident_type_id} {self.criticality or '-'} {self.status}: {self.count}"
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['site', 'incident_type', 'criticality', 'status', 'day'],
+                name='api_rollup_key_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='api_rollup_day_idx'),
+        ]
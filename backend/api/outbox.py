@@ -0,0 +1,144 @@
+"""
+Transactional outbox for incident notifications
+
+Incidents enqueue a NotificationOutbox row inside their own transaction, so
+a notification exists exactly when its incident does. Delivery happens later
+in the process_notification_outbox worker, which retries failed sends with
+exponential backoff.
+
+With NOTIFICATION_DIGEST_WINDOW set, non-critical incidents wait up to that
+long and go out together as one digest email; critical incidents are always
+sent straight away. Incidents submitted in one batch request are always
+emailed together as a single summary.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+import logging
+import uuid
+
+from .models import NotificationOutbox
+from .utils import deliver_incident_notification
+
+logger = logging.getLogger(__name__)
+
+
+def is_digested(incident):
+    """Return whether an incident's notification waits for the digest window"""
+    return bool(settings.NOTIFICATION_DIGEST_WINDOW) and incident.criticality != 'critical'
+
+
+def enqueue_incident_notification(incident):
+    """Queue the notification email for an incident; call inside the incident's transaction"""
+    next_attempt_at = timezone.now()
+    if is_digested(incident):
+        next_attempt_at += timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    return NotificationOutbox.objects.create(incident=incident, next_attempt_at=next_attempt_at)
+
+
+def enqueue_batch_notification(incidents):
+    """Queue one summary email for incidents submitted together; call inside their transaction"""
+    batch_id = uuid.uuid4()
+    return NotificationOutbox.objects.bulk_create(
+        NotificationOutbox(incident=incident, batch_id=batch_id) for incident in incidents
+    )
+
+
+def retry_delay(attempts):
+    """Return the backoff before the next delivery attempt after `attempts` failures"""
+    delay = settings.NOTIFICATION_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.NOTIFICATION_RETRY_MAX_DELAY))
+
+
+def record_attempt(entries, error=None):
+    """Record one delivery attempt of the given outbox entries, failed if `error` is set"""
+    now = timezone.now()
+    for entry in entries:
+        entry.attempts += 1
+        if error is None:
+            entry.status = 'sent'
+            entry.sent_at = now
+            entry.last_error = ''
+        else:
+            entry.last_error = str(error)
+            if entry.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                entry.status = 'failed'
+                logger.error(f"Giving up on notification for incident {entry.incident_id} after {entry.attempts} attempts: {error}")
+            else:
+                entry.next_attempt_at = now + retry_delay(entry.attempts)
+                logger.warning(f"Notification for incident {entry.incident_id} failed (attempt {entry.attempts}), retrying: {error}")
+        entry.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+
+
+def drain_outbox(batch_size=50):
+    """
+    Deliver up to batch_size due notifications and return (sent, failed)
+
+    The limit is exceeded rather than splitting a batch submission, whose
+    remaining entries are delivered with it.
+
+    Due rows are locked with SKIP LOCKED (where the database supports it) so
+    several workers can drain the outbox without sending the same email twice.
+    A worker killed mid-batch rolls back and leaves its rows pending. All
+    emails of a batch share one SMTP connection.
+    """
+    sent = failed = 0
+    with transaction.atomic():
+        now = timezone.now()
+        pending = (
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('incident__site', 'incident__incident_type')
+            .filter(status='pending')
+        )
+        due = list(pending.filter(next_attempt_at__lte=now).order_by('next_attempt_at')[:batch_size])
+        if not due:
+            return sent, failed
+
+        # A batch always goes out as one summary, even where the limit cut through it
+        batch_ids = {entry.batch_id for entry in due if entry.batch_id is not None}
+        if batch_ids:
+            due += pending.filter(batch_id__in=batch_ids).exclude(pk__in=[entry.pk for entry in due])
+
+        batches = {}
+        for entry in due:
+            if entry.batch_id is not None:
+                batches.setdefault(entry.batch_id, []).append(entry)
+        single = [entry for entry in due if entry.batch_id is None]
+
+        groups = list(batches.values())
+        groups += [[entry] for entry in single if not is_digested(entry.incident)]
+        digest = [entry for entry in single if is_digested(entry.incident)]
+        if digest:
+            # The oldest report's window has closed: everything queued since joins the same digest
+            digest += (
+                pending.filter(next_attempt_at__gt=now, attempts=0, batch_id__isnull=True)
+                .exclude(incident__criticality='critical')
+                .order_by('next_attempt_at')
+            )
+            groups.append(digest)
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            entries = [entry for group in groups for entry in group]
+            record_attempt(entries, e)
+            return sent, len(entries)
+
+        try:
+            for group in groups:
+                try:
+                    deliver_incident_notification([entry.incident for entry in group], connection=connection)
+                except Exception as e:
+                    record_attempt(group, e)
+                    failed += len(group)
+                else:
+                    record_attempt(group)
+                    sent += len(group)
+        finally:
+            connection.close()
+    return sent, failed
@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination for incidents
+
+Pages are ordered newest first by (created_at, id) and each one is fetched
+with a range condition on that key instead of OFFSET, so with the matching
+index the tenth thousandth page costs the same as the first. No COUNT(*) is
+run; clients follow the opaque `next` / `previous` links.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+import json
+import uuid
+
+
+class IncidentCursorPagination(BasePagination):
+    """Opaque-cursor pages over (-created_at, id)"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, incident, reverse=False):
+        position = {'t': incident.created_at.isoformat(), 'i': str(incident.pk)}
+        if reverse:
+            position['r'] = 1
+        token = urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token.rstrip('='))
+
+    def decode_cursor(self, request):
+        """Return (created_at, id, reverse) from the request's cursor, or None on the first page"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            created_at = parse_datetime(position['t'])
+            pk = uuid.UUID(position['i'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, bool(position.get('r'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[2]
+
+        if position is None:
+            queryset = queryset.order_by('-created_at', 'id')
+        elif not reverse:
+            created_at, pk, _ = position
+            # The redundant bound gives the index a starting point; the OR alone makes it scan from the top
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__gt=pk),
+                created_at__lte=created_at,
+            ).order_by('-created_at', 'id')
+        else:
+            # Walk backwards from the cursor, then restore newest-first order
+            created_at, pk, _ = position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__lt=pk),
+                created_at__gte=created_at,
+            ).order_by('created_at', '-id')
+
+        # One extra row tells whether there is another page in the walking direction
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        self.page = rows[:page_size]
+        if reverse:
+            self.page.reverse()
+
+        if not self.page:
+            self.next_link = self.previous_link = None
+        elif reverse:
+            self.next_link = self.encode_cursor(self.page[-1])
+            self.previous_link = self.encode_cursor(self.page[0], reverse=True) if has_more else None
+        else:
+            self.next_link = self.encode_cursor(self.page[-1]) if has_more else None
+            self.previous_link = self.encode_cursor(self.page[0], reverse=True) if position else None
+        return self.page
+
+    def get_next_link(self):
+        return self.next_link
+
+    def get_previous_link(self):
+        return self.previous_link
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,166 @@
+"""
+Minimal incremental PDF writer
+
+Each method returns the bytes it produced so callers can stream a document
+page by page instead of holding the whole file in memory. Only the pieces
+needed for QR posters are supported.
+"""
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _png_idat(png_bytes):
+    """
+    Return (width, height, idat) for an 8-bit, non-interlaced RGB PNG, or None
+
+    PNG's zlib stream with per-row filters is exactly what PDF's FlateDecode
+    with predictor 15 expects, so such images can be embedded without
+    decoding and re-compressing them.
+    """
+    if not png_bytes.startswith(PNG_SIGNATURE):
+        return None
+
+    position = len(PNG_SIGNATURE)
+    header = None
+    idat = []
+    while position + 8 <= len(png_bytes):
+        length, chunk_type = struct.unpack('>I4s', png_bytes[position:position + 8])
+        data = png_bytes[position + 8:position + 8 + length]
+        position += 12 + length
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', data)
+        elif chunk_type == b'IDAT':
+            idat.append(data)
+        elif chunk_type == b'IEND':
+            break
+
+    if header is None or not idat:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or color_type != 2 or interlace != 0:
+        return None
+    return width, height, b''.join(idat)
+
+
+class PdfStreamWriter:
+    """Write a PDF document incrementally, one page at a time"""
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self):
+        self._offsets = {}
+        self._position = 0
+        self._next_id = self.PAGES_ID + 1
+        self._page_ids = []
+
+    def _emit(self, data):
+        self._position += len(data)
+        return data
+
+    def _reserve(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _object(self, obj_id, body):
+        self._offsets[obj_id] = self._position
+        return self._emit(b'%d 0 obj\n' % obj_id + body + b'\nendobj\n')
+
+    def _stream(self, obj_id, entries, data):
+        body = b'<< %s /Length %d >>\nstream\n' % (entries.encode('latin-1'), len(data))
+        return self._object(obj_id, body + data + b'\nendstream')
+
+    def start(self):
+        """Return the PDF header"""
+        return self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def add_page(self, width, height, content, resources='', objects=()):
+        """
+        Add a page drawn by the given content stream
+
+        `objects` is a list of (obj_id, entries, stream data) tuples for
+        resources referenced by the page, with ids from `reserve_id()`.
+        Use None as the data for plain dictionary objects such as fonts.
+        """
+        chunks = []
+        for obj_id, entries, data in objects:
+            if data is None:
+                chunks.append(self._object(obj_id, b'<< %s >>' % entries.encode('latin-1')))
+            else:
+                chunks.append(self._stream(obj_id, entries, data))
+
+        content_id = self._reserve()
+        page_id = self._reserve()
+        chunks.append(self._stream(content_id, '/Filter /FlateDecode', zlib.compress(content)))
+        chunks.append(self._object(page_id, (
+            '<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] '
+            '/Resources << %s >> /Contents %d 0 R >>'
+            % (self.PAGES_ID, width, height, resources, content_id)
+        ).encode('latin-1')))
+        self._page_ids.append(page_id)
+        return b''.join(chunks)
+
+    def reserve_id(self):
+        """Reserve an object id for a page resource"""
+        return self._reserve()
+
+    def add_png_page(self, png_bytes):
+        """Add a page showing a PNG image at one point per pixel"""
+        embedded = _png_idat(png_bytes)
+        if embedded is not None:
+            width, height, data = embedded
+            entries = (
+                '/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                '/BitsPerComponent 8 /Filter /FlateDecode '
+                '/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns %d >>'
+                % (width, height, width)
+            )
+        else:
+            image = Image.open(io.BytesIO(png_bytes)).convert('RGB')
+            width, height = image.size
+            data = zlib.compress(image.tobytes())
+            entries = (
+                '/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                '/BitsPerComponent 8 /Filter /FlateDecode' % (width, height)
+            )
+
+        image_id = self.reserve_id()
+        content = b'q %d 0 0 %d 0 0 cm /Im0 Do Q' % (width, height)
+        return self.add_page(
+            width, height, content,
+            resources='/XObject << /Im0 %d 0 R >>' % image_id,
+            objects=[(image_id, entries, data)],
+        )
+
+    def finish(self):
+        """Return the page tree, catalog, cross-reference table and trailer"""
+        kids = ' '.join('%d 0 R' % page_id for page_id in self._page_ids)
+        chunks = [
+            self._object(self.PAGES_ID, (
+                '<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids))
+            ).encode('latin-1')),
+            self._object(self.CATALOG_ID, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES_ID),
+        ]
+
+        xref_position = self._position
+        size = self._next_id
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for obj_id in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self._offsets.get(obj_id, 0))
+        xref.append(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                    % (size, self.CATALOG_ID, xref_position))
+        chunks.append(self._emit(b''.join(xref)))
+        return b''.join(chunks)
+
+
+def pdf_string(text):
+    """Encode text as a PDF literal string for the standard WinAnsi fonts"""
+    encoded = text.encode('cp1252', errors='replace')
+    return b'(' + encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
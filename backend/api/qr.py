@@ -0,0 +1,214 @@
+"""
+Rendering of the printable QR poster shown for each site
+"""
+from django.conf import settings
+import numpy as np
+import qrcode
+import io
+from PIL import Image, ImageDraw
+
+from .qr_assets import assets, LOGO_SIZE
+
+
+# Bump whenever the poster layout changes so cached posters are re-rendered
+LAYOUT_VERSION = 2
+
+HEADER_FONT_SIZE = 28
+SMALL_HEADER_FONT_SIZE = 22
+DESCRIPTION_FONT_SIZE = 18
+
+# Quiet zone width in modules
+QR_BORDER = 4
+
+# Error-correction levels, most robust first
+QR_ERROR_CORRECTION_LEVELS = [
+    qrcode.constants.ERROR_CORRECT_H,
+    qrcode.constants.ERROR_CORRECT_Q,
+    qrcode.constants.ERROR_CORRECT_M,
+    qrcode.constants.ERROR_CORRECT_L,
+]
+
+# Fixed layout parameters
+QR_SIZE = 300
+HEADER_HEIGHT = 70
+DESCRIPTION_HEIGHT = 80
+MARGIN_TOP = 25
+MARGIN_BOTTOM = 35
+MARGIN_LEFT = 20
+MARGIN_RIGHT = 20
+
+
+def build_qr_url(request, site):
+    """
+    Return the URL encoded in a site's QR code: a short link that redirects to
+    the public feedback form. A 6-character code instead of the 36-character
+    UUID lets the QR code use a lower version (fewer modules).
+    Pass request=None outside a request (e.g. management commands) to use the production URL
+    """
+    # Check if we're in production (not localhost)
+    if request is not None and ('localhost' in request.get_host() or '127.0.0.1' in request.get_host()):
+        # Development environment
+        return f"{request.scheme}://{request.get_host()}/hex/s/{site.short_code}"
+    # Production environment - use the configured production URL
+    return f"{settings.PRODUCTION_URL}/hex/s/{site.short_code}"
+
+
+class TextBlock:
+    """A piece of text placed on the poster"""
+
+    def __init__(self, text, size, x, y):
+        self.text = text
+        self.size = size
+        self.x = x
+        self.y = y
+
+
+class PosterLayout:
+    """Final canvas size and the position of every element on a poster"""
+
+    def __init__(self, width, height, logo_x, logo_y, qr_x, qr_y, site_name, description):
+        self.width = width
+        self.height = height
+        self.logo_x = logo_x
+        self.logo_y = logo_y
+        self.qr_x = qr_x
+        self.qr_y = qr_y
+        self.site_name = site_name
+        self.description = description
+
+
+# Scratch surface used only to measure text; nothing is ever drawn on it
+_measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+def measure_text(text, size):
+    """Return the (width, height) of text drawn with the poster font at the given size"""
+    bbox = _measure.textbbox((0, 0), text, font=assets.font(size))
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+def compute_layout(site_name, measure=measure_text):
+    """
+    Measure every text block and work out the final canvas size up front,
+    so the poster can be drawn in a single pass on a single canvas
+
+    `measure(text, size)` returns a text block's (width, height); vector
+    output passes its own font metrics here.
+    """
+    # Calculate total dimensions with fixed margins
+    total_width = QR_SIZE + MARGIN_LEFT + MARGIN_RIGHT
+    total_height = MARGIN_TOP + HEADER_HEIGHT + QR_SIZE + DESCRIPTION_HEIGHT + MARGIN_BOTTOM + 15
+    
+    # Position logo and site name at the top with fixed alignment
+    logo_x = MARGIN_LEFT
+    logo_y = MARGIN_TOP + (HEADER_HEIGHT - LOGO_SIZE) // 2
+    logo_end = logo_x + LOGO_SIZE + 20  # Increased spacing
+    available_width = total_width - logo_end - 30
+    
+    # Check if site name fits, if not, try smaller font
+    site_size = HEADER_FONT_SIZE
+    site_width, site_height = measure(site_name, site_size)
+    if site_width > available_width:
+        site_size = SMALL_HEADER_FONT_SIZE
+        site_width, site_height = measure(site_name, site_size)
+        # For extremely long names, widen the canvas to accommodate the full name
+        total_width = max(total_width, logo_end + site_width + 30)
+    
+    # Site name to the right of logo, centered vertically in the header
+    site_block = TextBlock(site_name, site_size, logo_end, MARGIN_TOP + (HEADER_HEIGHT - site_height) // 2)
+    
+    # Description centered at the bottom
+    description = "Scan for Site info and Reporting Issues"
+    desc_width, desc_height = measure(description, DESCRIPTION_FONT_SIZE)
+    desc_y = total_height - MARGIN_BOTTOM - desc_height
+    desc_block = TextBlock(description, DESCRIPTION_FONT_SIZE, (total_width - desc_width) // 2, desc_y)
+    
+    # QR code centered horizontally and midway between header and description
+    header_bottom = MARGIN_TOP + HEADER_HEIGHT
+    qr_x = (total_width - QR_SIZE) // 2
+    qr_y = header_bottom + (desc_y - header_bottom - QR_SIZE) // 2
+    
+    return PosterLayout(total_width, total_height, logo_x, logo_y, qr_x, qr_y, site_block, desc_block)
+
+
+def choose_qr_encoding(qr_url):
+    """
+    Return the (version, error correction) to encode a URL with: the smallest
+    version that fits, at the most robust error-correction level that still
+    fits in that version
+    """
+    versions = {}
+    for level in QR_ERROR_CORRECTION_LEVELS:
+        qr = qrcode.QRCode(error_correction=level)
+        qr.add_data(qr_url)
+        versions[level] = qr.best_fit()
+
+    smallest = versions[qrcode.constants.ERROR_CORRECT_L]
+    for level in QR_ERROR_CORRECTION_LEVELS:
+        if versions[level] == smallest:
+            return smallest, level
+
+
+def make_qr_matrix(qr_url):
+    """Encode a URL and return its QR module matrix (True = dark), quiet zone included"""
+    version, error_correction = choose_qr_encoding(qr_url)
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=QR_BORDER)
+    qr.add_data(qr_url)
+    qr.make(fit=False)
+    return qr.get_matrix()
+
+
+def qr_box_size(matrix):
+    """Return the largest whole module size in pixels that fits the QR code in its QR_SIZE slot"""
+    return max(1, QR_SIZE // len(matrix))
+
+
+def render_qr_modules(matrix, box_size=None):
+    """
+    Expand a QR module matrix into a grayscale pixel array (0 = dark, 255 = light)
+    by block repetition, matching qrcode's PIL image factory pixel for pixel
+    """
+    if box_size is None:
+        box_size = qr_box_size(matrix)
+    modules = np.asarray(matrix, dtype=bool)
+    pixels = np.where(modules, np.uint8(0), np.uint8(255))
+    return pixels.repeat(box_size, axis=0).repeat(box_size, axis=1)
+
+
+def draw_poster(layout, qr_pixels):
+    """Draw a poster from a precomputed layout onto one freshly allocated canvas"""
+    canvas = np.full((layout.height, layout.width, 3), 255, dtype=np.uint8)
+    
+    # Write the QR modules straight into the canvas buffer, centered in the QR slot and clipped to the canvas
+    qr_x = layout.qr_x + (QR_SIZE - qr_pixels.shape[1]) // 2
+    qr_y = layout.qr_y + (QR_SIZE - qr_pixels.shape[0]) // 2
+    visible = qr_pixels[:layout.height - qr_y, :layout.width - qr_x]
+    canvas[qr_y:qr_y + visible.shape[0], qr_x:qr_x + visible.shape[1]] = visible[:, :, None]
+    
+    composite = Image.fromarray(canvas, 'RGB')
+    draw = ImageDraw.Draw(composite)
+    
+    logo_img = assets.logo()
+    if logo_img is not None:
+        composite.paste(logo_img, (layout.logo_x, layout.logo_y), logo_img if logo_img.mode == 'RGBA' else None)
+    else:
+        # Fallback to text logo
+        draw.text((layout.logo_x, layout.logo_y + 10), "HEXA", fill='black', font=assets.font(HEADER_FONT_SIZE))
+    
+    site_block = layout.site_name
+    draw.text((site_block.x, site_block.y), site_block.text, fill='black', font=assets.font(site_block.size))
+    
+    # Description is drawn after the QR so it stays on top of the quiet zone
+    desc_block = layout.description
+    draw.text((desc_block.x, desc_block.y), desc_block.text, fill='black', font=assets.font(desc_block.size))
+    return composite
+
+
+def render_poster(site_name, qr_url):
+    """Render the QR poster for a site and return it as PNG bytes"""
+    qr_pixels = render_qr_modules(make_qr_matrix(qr_url))
+    composite = draw_poster(compute_layout(site_name), qr_pixels)
+    
+    buffer = io.BytesIO()
+    composite.save(buffer, format='PNG')
+    return buffer.getvalue()
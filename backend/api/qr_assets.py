@@ -0,0 +1,129 @@
+"""
+Process-wide registry of the logo and fonts drawn on QR posters
+
+Assets are decoded once per worker and kept in memory; the logo is reloaded
+automatically when its file's mtime changes.
+"""
+from django.conf import settings
+from PIL import Image, ImageFont
+import hashlib
+import io
+import os
+import threading
+import zlib
+
+
+FONT_PATH = "/System/Library/Fonts/Arial.ttf"
+LOGO_SIZE = 50
+
+# Vector posters embed the logo at this multiple of LOGO_SIZE so it stays sharp in print
+PRINT_LOGO_SCALE = 4
+
+
+def get_logo_path():
+    """Return the path of the Hexa Climate logo used on posters"""
+    return os.path.join(settings.BASE_DIR, 'static', 'images', 'image.png')
+
+
+class PrintLogo:
+    """Logo pre-encoded for embedding in SVG (PNG bytes) and PDF (Flate streams)"""
+
+    def __init__(self, image):
+        self.width, self.height = image.size
+        has_alpha = image.mode == 'RGBA'
+
+        # A 64-colour palette is visually lossless for the logo and keeps vector posters small
+        image = image.quantize(64, method=Image.Quantize.FASTOCTREE if has_alpha else None)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        self.png = buffer.getvalue()
+
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        self.rgb = zlib.compress(image.convert('RGB').tobytes(), 9)
+        self.alpha = zlib.compress(image.getchannel('A').tobytes(), 9) if has_alpha else None
+
+
+class AssetRegistry:
+    """Holds the pre-resized logo and loaded fonts for the poster renderer"""
+
+    def __init__(self, logo_path, font_path, logo_size):
+        self.logo_path = logo_path
+        self.font_path = font_path
+        self.logo_size = logo_size
+        self._lock = threading.Lock()
+        self._logo_loaded = False
+        self._logo_mtime = None
+        self._logo = None
+        self._logo_hash = 'no-logo'
+        self._print_logo = None
+        self._fonts = {}
+
+    def _refresh_logo(self):
+        try:
+            mtime = os.stat(self.logo_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if self._logo_loaded and mtime == self._logo_mtime:
+            return
+
+        with self._lock:
+            if self._logo_loaded and mtime == self._logo_mtime:
+                return
+
+            logo, logo_hash, print_logo = None, 'no-logo', None
+            if mtime is None:
+                print(f"⚠️  Logo not found at: {self.logo_path}")
+            else:
+                try:
+                    with open(self.logo_path, 'rb') as logo_file:
+                        raw = logo_file.read()
+                    logo_hash = hashlib.sha256(raw).hexdigest()
+                    source = Image.open(io.BytesIO(raw))
+                    # Resize once; every poster pastes this copy
+                    logo = source.resize((self.logo_size, self.logo_size), Image.Resampling.LANCZOS)
+                    print_logo = PrintLogo(source.resize(
+                        (self.logo_size * PRINT_LOGO_SCALE, self.logo_size * PRINT_LOGO_SCALE),
+                        Image.Resampling.LANCZOS,
+                    ))
+                    print(f"✅ Hexa Climate logo loaded from: {self.logo_path}")
+                except Exception as e:
+                    print(f"⚠️  Error loading local logo: {e}")
+                    logo, print_logo = None, None
+
+            self._logo, self._logo_hash, self._print_logo = logo, logo_hash, print_logo
+            self._logo_mtime = mtime
+            self._logo_loaded = True
+
+    def logo(self):
+        """Return the resized logo image, or None if it is missing or unreadable"""
+        self._refresh_logo()
+        return self._logo
+
+    def print_logo(self):
+        """Return the higher-resolution logo used by vector posters, or None"""
+        self._refresh_logo()
+        return self._print_logo
+
+    def logo_hash(self):
+        """Return a hash of the logo file contents"""
+        self._refresh_logo()
+        return self._logo_hash
+
+    def font(self, size):
+        """Return the poster font at the given size, falling back to Pillow's default font"""
+        font = self._fonts.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, size)
+            except Exception:
+                font = ImageFont.load_default()
+            self._fonts[size] = font
+        return font
+
+
+assets = AssetRegistry(
+    logo_path=get_logo_path(),
+    font_path=FONT_PATH,
+    logo_size=LOGO_SIZE,
+)
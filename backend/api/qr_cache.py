@@ -0,0 +1,219 @@
+"""
+Content-addressed cache for rendered site QR posters
+
+Posters are keyed by a hash of everything that affects their pixels, so a
+repeat request costs a dictionary lookup (or a small file read) instead of a
+Pillow render. Entries live in an in-process LRU and on disk under MEDIA_ROOT.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process coalescing only
+    fcntl = None
+
+from .qr import LAYOUT_VERSION, build_qr_url, render_poster
+from .qr_assets import assets
+
+logger = logging.getLogger(__name__)
+
+
+def poster_cache_key(site_name, qr_url):
+    """Return the content hash identifying a rendered poster"""
+    parts = [site_name, qr_url, assets.logo_hash(), str(LAYOUT_VERSION)]
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def poster_etag(site, qr_url):
+    """Return a strong ETag for a site's poster, changing whenever the site is saved"""
+    parts = [site.updated_at.isoformat(), poster_cache_key(site.name, qr_url)]
+    return '"%s"' % hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """A render in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the
+    function and every duplicate that arrives meanwhile waits for its result
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class PosterCache:
+    """Two-tier (memory LRU + disk) cache of poster PNG bytes"""
+
+    def __init__(self, max_entries, cache_dir):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()  # key -> (site_id, png bytes)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def _site_dir(self, site_id):
+        return os.path.join(self.cache_dir, str(site_id))
+
+    def _disk_path(self, site_id, key):
+        return os.path.join(self._site_dir(site_id), f'{key}.png')
+
+    def _remember(self, site_id, key, data):
+        with self._lock:
+            self._entries[key] = (str(site_id), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, site_id, key):
+        """Return cached poster bytes, or None on a miss in both tiers"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        try:
+            with open(self._disk_path(site_id, key), 'rb') as poster_file:
+                data = poster_file.read()
+        except OSError:
+            return None
+
+        self._remember(site_id, key, data)
+        return data
+
+    def set(self, site_id, key, data):
+        """Store poster bytes in both tiers"""
+        self._remember(site_id, key, data)
+
+        site_dir = self._site_dir(site_id)
+        try:
+            os.makedirs(site_dir, exist_ok=True)
+            # Write to a temp file and rename so readers never see partial posters
+            fd, tmp_path = tempfile.mkstemp(dir=site_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, self._disk_path(site_id, key))
+        except OSError as e:
+            logger.warning(f"Could not write QR poster to disk cache for site {site_id}: {e}")
+
+    def invalidate_site(self, site_id):
+        """Drop every cached poster belonging to a site"""
+        site_id = str(site_id)
+        with self._lock:
+            stale_keys = [key for key, (owner, _) in self._entries.items() if owner == site_id]
+            for key in stale_keys:
+                del self._entries[key]
+
+        shutil.rmtree(self._site_dir(site_id), ignore_errors=True)
+
+    def clear(self):
+        """Drop every cached poster"""
+        with self._lock:
+            self._entries.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _render_locked(self, site, qr_url, key):
+        """
+        Render a missing poster while holding a lock file, so that workers in
+        other processes wait for this render and then read it from disk
+        """
+        site_dir = self._site_dir(site.id)
+        lock_file = None
+        if fcntl is not None:
+            try:
+                os.makedirs(site_dir, exist_ok=True)
+                lock_file = open(os.path.join(site_dir, f'{key}.lock'), 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except OSError as e:
+                logger.warning(f"Could not lock QR poster render for site {site.id}: {e}")
+
+        try:
+            # Another process may have finished the render while we waited for the lock
+            data = self.get(site.id, key)
+            if data is None:
+                data = render_poster(site.name, qr_url)
+                self.set(site.id, key, data)
+            return data
+        finally:
+            if lock_file is not None:
+                lock_file.close()  # closing the file releases the lock
+
+    def get_or_render(self, site, qr_url):
+        """
+        Return the poster for a site, rendering and caching it on a miss
+
+        Concurrent misses for the same poster are coalesced: one thread renders
+        and the others wait for its result instead of rendering again.
+        """
+        key = poster_cache_key(site.name, qr_url)
+        data = self.get(site.id, key)
+        if data is None:
+            data = self._flight.do(key, lambda: self._render_locked(site, qr_url, key))
+        return data
+
+
+poster_cache = PosterCache(
+    max_entries=settings.QR_POSTER_CACHE_SIZE,
+    cache_dir=settings.QR_POSTER_CACHE_DIR,
+)
+
+
+_warm_executor = None
+_warm_executor_lock = threading.Lock()
+
+
+def _warm(site):
+    try:
+        poster_cache.get_or_render(site, build_qr_url(None, site))
+    except Exception as e:
+        logger.error(f"Background QR poster render failed for site {site.id}: {e}")
+
+
+def warm_site_poster(site):
+    """Render a site's poster on a background thread so the first request is a cache hit"""
+    global _warm_executor
+    with _warm_executor_lock:
+        if _warm_executor is None:
+            _warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='qr-warm')
+    return _warm_executor.submit(_warm, site)
@@ -0,0 +1,211 @@
+"""
+Bulk export of site QR posters as a streamed ZIP or multi-page PDF
+
+Posters missing from the cache are rendered across a process pool while
+already finished posters are streamed to the client, in site order.
+
+Exports in a web worker share one pool of QR_EXPORT_WORKERS processes,
+shut down after QR_EXPORT_POOL_IDLE_TIMEOUT seconds without an export.
+Each process holds its own copy of Django and Pillow, so the pool costs
+that much memory per web worker while it is up. Its processes are started
+with "spawn" rather than forked, because forking a process that is running
+background threads (poster warming, image processing) can deadlock the
+child on a lock held by another thread at fork time.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.utils.text import slugify
+import multiprocessing
+import threading
+import time
+import zipfile
+
+from .pdf import PdfStreamWriter
+from .qr import render_poster
+from .qr_cache import poster_cache, poster_cache_key
+
+
+EXPORT_FORMATS = {
+    'zip': 'application/zip',
+    'pdf': 'application/pdf',
+}
+
+
+class _StreamBuffer:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _init_render_process():
+    import django
+    django.setup()
+
+
+def _render_job(job):
+    site_name, qr_url = job
+    return render_poster(site_name, qr_url)
+
+
+def new_render_pool(workers):
+    """Return a pool of `workers` spawned render processes"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_render_process,
+    )
+
+
+_render_pool = None
+_render_pool_users = 0
+_render_pool_idle_timer = None
+_render_pool_lock = threading.Lock()
+
+
+def acquire_render_pool():
+    """
+    Return this process's render pool of QR_EXPORT_WORKERS processes, started
+    on first use; hand it back with release_render_pool()
+    """
+    global _render_pool, _render_pool_users
+    with _render_pool_lock:
+        if _render_pool_idle_timer is not None:
+            _render_pool_idle_timer.cancel()
+        if _render_pool is None:
+            _render_pool = new_render_pool(settings.QR_EXPORT_WORKERS)
+        _render_pool_users += 1
+        return _render_pool
+
+
+def release_render_pool():
+    """Start the idle countdown once no export is using the pool"""
+    global _render_pool_users, _render_pool_idle_timer
+    with _render_pool_lock:
+        _render_pool_users -= 1
+        if _render_pool_users or _render_pool is None or not settings.QR_EXPORT_POOL_IDLE_TIMEOUT:
+            return
+        _render_pool_idle_timer = threading.Timer(settings.QR_EXPORT_POOL_IDLE_TIMEOUT, _shut_down_idle_render_pool)
+        _render_pool_idle_timer.daemon = True
+        _render_pool_idle_timer.start()
+
+
+def _shut_down_idle_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        # A timer that fired while an export was acquiring the pool has been superseded
+        if _render_pool_idle_timer is not threading.current_thread() or _render_pool_users:
+            return
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _discard_render_pool(pool):
+    """Drop the shared pool after one of its processes died, so the next export starts a fresh one"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_posters(entries, workers=None):
+    """
+    Yield (site, png bytes) for each (site, qr_url) entry, in order
+
+    Cache hits are served directly; misses are rendered in a process pool and
+    written back to the poster cache as they complete. Without `workers` the
+    shared pool is used; with it (management commands) a pool of that size
+    is started for this call.
+    """
+    entries = [(site, qr_url, poster_cache_key(site.name, qr_url)) for site, qr_url in entries]
+    cached = {}
+    misses = []
+    for site, qr_url, key in entries:
+        data = poster_cache.get(site.id, key)
+        if data is None:
+            misses.append((site.name, qr_url))
+        else:
+            cached[key] = data
+
+    if not misses:
+        for site, qr_url, key in entries:
+            yield site, cached[key]
+        return
+
+    own_executor = workers is not None
+    if own_executor:
+        workers = min(workers, len(misses))
+        executor = new_render_pool(workers)
+    else:
+        workers = settings.QR_EXPORT_WORKERS
+        executor = acquire_render_pool()
+    rendered = None
+    try:
+        # map() submits every job up front and yields results in order as they finish
+        rendered = executor.map(_render_job, misses, chunksize=max(1, len(misses) // (workers * 4)))
+        for site, qr_url, key in entries:
+            data = cached.get(key)
+            if data is None:
+                data = next(rendered)
+                poster_cache.set(site.id, key, data)
+            yield site, data
+    except BrokenProcessPool:
+        if not own_executor:
+            _discard_render_pool(executor)
+        raise
+    finally:
+        # Cancel pending renders if the client went away mid-download
+        if rendered is not None:
+            rendered.close()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            release_render_pool()
+
+
+def poster_filename(site):
+    """Return the file name used for a site's poster inside an export"""
+    return f"{slugify(site.name) or 'site'}-{site.id}-qr.png"
+
+
+def stream_zip(entries, workers=None):
+    """Yield a ZIP archive of poster PNGs chunk by chunk"""
+    buffer = _StreamBuffer()
+    date_time = time.localtime()[:6]
+    # PNGs are already compressed, so store them as-is
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for site, data in iter_posters(entries, workers):
+            archive.writestr(zipfile.ZipInfo(poster_filename(site), date_time), data)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_pdf(entries, workers=None):
+    """Yield a PDF with one poster per page chunk by chunk"""
+    writer = PdfStreamWriter()
+    yield writer.start()
+    for site, data in iter_posters(entries, workers):
+        yield writer.add_png_page(data)
+    yield writer.finish()
+
+
+def stream_export(entries, export_format, workers=None):
+    """Yield the bytes of a poster export in the requested format"""
+    if export_format == 'pdf':
+        return stream_pdf(entries, workers)
+    return stream_zip(entries, workers)
@@ -0,0 +1,164 @@
+"""
+Vector (SVG and PDF) output for site QR posters
+
+QR modules become filled paths and the site name stays real text, so posters
+print sharply at any size and are a few KB regardless of the print size.
+The layout is shared with the PNG renderer but measured with Helvetica
+metrics, which is the font vector viewers substitute for Arial.
+"""
+from xml.sax.saxutils import escape, quoteattr
+import base64
+
+from .pdf import PdfStreamWriter, pdf_string
+from .qr import LOGO_SIZE, QR_SIZE, compute_layout, make_qr_matrix, qr_box_size
+from .qr_assets import assets
+
+
+VECTOR_FORMATS = {
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+}
+
+# Helvetica/Arial advance widths (1/1000 em) for printable ASCII, from the standard AFM
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+# Distance from the top of the text box to the baseline, as a fraction of the font size
+_ASCENT = 0.905
+
+
+def measure_helvetica(text, size):
+    """Return the (width, height) of text set in Helvetica at the given size"""
+    units = sum(
+        _HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556
+        for char in text
+    )
+    return round(units * size / 1000), size
+
+
+def _dark_runs(matrix):
+    """Yield (row, column, length) for each horizontal run of dark modules"""
+    for row, modules in enumerate(matrix):
+        start = None
+        for column, dark in enumerate(modules):
+            if dark and start is None:
+                start = column
+            elif not dark and start is not None:
+                yield row, start, column - start
+                start = None
+        if start is not None:
+            yield row, start, len(modules) - start
+
+
+def render_poster_svg(site_name, qr_url):
+    """Render the QR poster for a site as SVG bytes"""
+    layout = compute_layout(site_name, measure=measure_helvetica)
+    matrix = make_qr_matrix(qr_url)
+    box_size = qr_box_size(matrix)
+    qr_offset = (QR_SIZE - len(matrix) * box_size) // 2
+
+    path = ''.join(
+        f'M{column},{row}h{length}v1h-{length}z'
+        for row, column, length in _dark_runs(matrix)
+    )
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+        f'width="{layout.width}" height="{layout.height}" viewBox="0 0 {layout.width} {layout.height}">',
+        f'<rect width="{layout.width}" height="{layout.height}" fill="#fff"/>',
+        # One module per user unit, scaled up to the raster poster's box size
+        f'<path transform="translate({layout.qr_x + qr_offset} {layout.qr_y + qr_offset}) scale({box_size})" '
+        f'shape-rendering="crispEdges" fill="#000" d="{path}"/>',
+    ]
+
+    print_logo = assets.print_logo()
+    if print_logo is not None:
+        logo_href = 'data:image/png;base64,' + base64.b64encode(print_logo.png).decode()
+        parts.append(
+            f'<image x="{layout.logo_x}" y="{layout.logo_y}" width="{LOGO_SIZE}" height="{LOGO_SIZE}" '
+            f'preserveAspectRatio="none" href="{logo_href}"/>'
+        )
+    else:
+        parts.append(_svg_text("HEXA", layout.logo_x, layout.logo_y + 10, 28))
+
+    for block in (layout.site_name, layout.description):
+        parts.append(_svg_text(block.text, block.x, block.y, block.size))
+    parts.append('</svg>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _svg_text(text, x, y, size):
+    baseline = y + size * _ASCENT
+    return (
+        f'<text x="{x}" y="{baseline:.1f}" font-family={quoteattr("Arial, Helvetica, sans-serif")} '
+        f'font-size="{size}" fill="#000">{escape(text)}</text>'
+    )
+
+
+def render_poster_pdf(site_name, qr_url):
+    """Render the QR poster for a site as a single-page PDF"""
+    layout = compute_layout(site_name, measure=measure_helvetica)
+    matrix = make_qr_matrix(qr_url)
+    box_size = qr_box_size(matrix)
+    qr_x = layout.qr_x + (QR_SIZE - len(matrix) * box_size) // 2
+    qr_y = layout.qr_y + (QR_SIZE - len(matrix) * box_size) // 2
+    height = layout.height
+
+    writer = PdfStreamWriter()
+    chunks = [writer.start()]
+    font_id = writer.reserve_id()
+    objects = [(font_id, '/Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding', None)]
+    resources = f'/Font << /F1 {font_id} 0 R >>'
+
+    # PDF's origin is the bottom-left corner, so y coordinates are flipped
+    content = [b'0 g']
+    for row, column, length in _dark_runs(matrix):
+        x = qr_x + column * box_size
+        y = height - (qr_y + (row + 1) * box_size)
+        content.append(b'%d %d %d %d re' % (x, y, length * box_size, box_size))
+    content.append(b'f')
+
+    print_logo = assets.print_logo()
+    if print_logo is not None:
+        logo_id = writer.reserve_id()
+        entries = (
+            f'/Type /XObject /Subtype /Image /Width {print_logo.width} /Height {print_logo.height} '
+            f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode'
+        )
+        if print_logo.alpha is not None:
+            mask_id = writer.reserve_id()
+            objects.append((mask_id, (
+                f'/Type /XObject /Subtype /Image /Width {print_logo.width} /Height {print_logo.height} '
+                f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode'
+            ), print_logo.alpha))
+            entries += f' /SMask {mask_id} 0 R'
+        objects.append((logo_id, entries, print_logo.rgb))
+        resources += f' /XObject << /Logo {logo_id} 0 R >>'
+        content.append(b'q %d 0 0 %d %d %d cm /Logo Do Q' % (
+            LOGO_SIZE, LOGO_SIZE, layout.logo_x, height - layout.logo_y - LOGO_SIZE
+        ))
+    else:
+        content.append(_pdf_text("HEXA", layout.logo_x, height - (layout.logo_y + 10 + 28 * _ASCENT), 28))
+
+    for block in (layout.site_name, layout.description):
+        content.append(_pdf_text(block.text, block.x, height - (block.y + block.size * _ASCENT), block.size))
+
+    chunks.append(writer.add_page(layout.width, height, b'\n'.join(content), resources, objects))
+    chunks.append(writer.finish())
+    return b''.join(chunks)
+
+
+def _pdf_text(text, x, baseline, size):
+    return b'BT /F1 %d Tf %d %.1f Td %s Tj ET' % (size, x, baseline, pdf_string(text))
+
+
+def render_vector_poster(site_name, qr_url, vector_format):
+    """Render the QR poster for a site in one of VECTOR_FORMATS"""
+    if vector_format == 'pdf':
+        return render_poster_pdf(site_name, qr_url)
+    return render_poster_svg(site_name, qr_url)
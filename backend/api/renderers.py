@@ -0,0 +1,35 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class BinaryRenderer(BaseRenderer):
+    """Pass pre-encoded file bytes straight through to the response"""
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or isinstance(data, bytes):
+            return data
+        # Errors raised inside binary actions still carry a dict payload
+        return json.dumps(data).encode('utf-8')
+
+
+class PNGRenderer(BinaryRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+
+class ZIPRenderer(BinaryRenderer):
+    media_type = 'application/zip'
+    format = 'zip'
+
+
+class PDFRenderer(BinaryRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class SVGRenderer(BinaryRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
@@ -0,0 +1,103 @@
+"""
+Incident counts rolled up per (site, incident type, criticality, status, day)
+
+Dashboards read IncidentRollup instead of counting incidents, so their cost
+depends on the number of sites, types and days shown, not on how many
+incidents exist. Signals adjust the affected rows whenever an incident is
+created, changes one of those attributes or is deleted, in the same
+transaction as the change: Incident.save() opens one around the save and
+its signals, and deletions send post_delete inside their own. Writes that
+bypass signals (bulk_create in the batch endpoint) call record_incidents()
+themselves; anything else that slips through is fixed by the
+rebuild_incident_rollups command.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Incident, IncidentRollup
+
+ROLLUP_FIELDS = ['site_id', 'incident_type_id', 'criticality', 'status', 'created_at']
+
+
+def incident_key(incident):
+    """
+    Return the rollup key of an incident as (site, incident type, criticality, status, day),
+    or None if it has no creation time yet or some of the fields were not loaded
+    """
+    values = incident.__dict__
+    if any(field not in values for field in ROLLUP_FIELDS) or values['created_at'] is None:
+        return None
+    return (
+        values['site_id'],
+        values['incident_type_id'],
+        values['criticality'] or '',
+        values['status'],
+        timezone.localdate(values['created_at']),
+    )
+
+
+def stored_key(pk):
+    """Return the rollup key of an incident as currently saved in the database"""
+    incident = Incident.objects.filter(pk=pk).only(*ROLLUP_FIELDS).first()
+    return incident_key(incident) if incident is not None else None
+
+
+def adjust(key, delta):
+    """Add delta to the count of one rollup row, creating or deleting the row as needed"""
+    site_id, incident_type_id, criticality, status, day = key
+    rows = IncidentRollup.objects.filter(
+        site_id=site_id, incident_type_id=incident_type_id, criticality=criticality, status=status, day=day,
+    )
+    if rows.update(count=F('count') + delta):
+        if delta < 0:
+            rows.filter(count=0).delete()
+        return
+    if delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            IncidentRollup.objects.create(
+                site_id=site_id, incident_type_id=incident_type_id, criticality=criticality,
+                status=status, day=day, count=delta,
+            )
+    except IntegrityError:
+        # Created by a concurrent transaction between the update and the insert
+        rows.update(count=F('count') + delta)
+
+
+def record_incidents(incidents, delta=1):
+    """Count (or with delta=-1, uncount) incidents saved without signals, e.g. by bulk_create"""
+    keys = Counter(incident_key(incident) for incident in incidents)
+    keys.pop(None, None)
+    for key, count in keys.items():
+        adjust(key, delta * count)
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the incidents table and return how many rows were written"""
+    with transaction.atomic():
+        IncidentRollup.objects.all().delete()
+        groups = (
+            Incident.objects.order_by()
+            # NULL and '' criticality share one row
+            .annotate(day=TruncDate('created_at'), level=Coalesce('criticality', Value('')))
+            .values('site_id', 'incident_type_id', 'level', 'status', 'day')
+            .annotate(count=Count('id'))
+        )
+        rows = [
+            IncidentRollup(
+                site_id=group['site_id'],
+                incident_type_id=group['incident_type_id'],
+                criticality=group['level'],
+                status=group['status'],
+                day=group['day'],
+                count=group['count'],
+            )
+            for group in groups.iterator()
+        ]
+        IncidentRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
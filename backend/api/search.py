@@ -0,0 +1,72 @@
+"""
+Full-text search over incident descriptions and reporter names
+
+On PostgreSQL, api_incident has a generated `search_vector` tsvector
+column (description weighted above reporter name) with a GIN index, so
+matches come from the index and results are ranked with ts_rank. On SQLite,
+an FTS5 table kept in step by triggers plays the same role and ranks with
+bm25. Other databases fall back to case-insensitive substring matching.
+Migration 0026 creates the column or table.
+
+Every word of the query must match, as a prefix, so results narrow while
+an admin is still typing. Descriptions are indexed stemmed ('english') and
+reporter names as written ('simple'), so on PostgreSQL each word is looked
+up in both forms: stemming 'Mary' to 'mari', or dropping 'Will' as a stop
+word, would otherwise miss the names.
+
+The SQLite FTS5 table follows api_incident by its implicit rowid, because
+external-content tables need an integer key and incidents have UUID keys.
+VACUUM may renumber the rowids of such a table, leaving the index pointing
+at the wrong incidents; after a VACUUM, resynchronise it with
+`INSERT INTO api_incident_fts(api_incident_fts) VALUES ('rebuild')`.
+"""
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+import re
+
+MAX_TERMS = 8
+
+INCIDENT_TABLE = 'api_incident'
+FTS_TABLE = 'api_incident_fts'
+
+
+def search_terms(query):
+    """Split a search box entry into at most MAX_TERMS words, dropping query-syntax characters"""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def search_incidents(queryset, query):
+    """
+    Narrow an Incident queryset to those matching every word of the query,
+    annotated with `search_rank` (higher is better)
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' && '.join("(to_tsquery('english', %s) || to_tsquery('simple', %s))" for _ in terms)
+        params = [f'{term}:*' for term in terms for _ in range(2)]
+        return queryset.filter(
+            RawSQL(f'{INCIDENT_TABLE}.search_vector @@ ({tsquery})', params, output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank({INCIDENT_TABLE}.search_vector, {tsquery})', params, output_field=FloatField())
+        )
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            RawSQL(f'{INCIDENT_TABLE}.rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)', [match], output_field=BooleanField())
+        ).annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {INCIDENT_TABLE}.rowid)',
+                [match], output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(description__icontains=term) | Q(reporter_name__icontains=term)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
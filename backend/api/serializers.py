@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.conf import settings
+from .incident_types import incident_types
 from .models import Site, EmergencyContact, Incident, IncidentImage, NotificationEmail, IncidentType
 
 
@@ -13,8 +14,8 @@ class IncidentTypeSerializer(serializers.ModelSerializer):
 class SiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Site
-        fields = ['id', 'name', 'address', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'address', 'short_code', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'short_code', 'created_at', 'updated_at']
 
 
 class EmergencyContactSerializer(serializers.ModelSerializer):
@@ -28,10 +29,11 @@ class EmergencyContactSerializer(serializers.ModelSerializer):
 
 class IncidentImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = IncidentImage
-        fields = ['id', 'image', 'image_url', 'caption', 'created_at']
+        fields = ['id', 'image', 'image_url', 'thumbnail_url', 'caption', 'created_at']
         read_only_fields = ['id', 'created_at']
 
     def get_image_url(self, obj):
@@ -40,8 +42,25 @@ class IncidentImageSerializer(serializers.ModelSerializer):
             return f'/hex/media/{obj.image}'
         return None
 
+    def get_thumbnail_url(self, obj):
+        """Return relative URL of the thumbnail, or None until the upload has been processed"""
+        if obj.thumbnail:
+            return f'/hex/media/{obj.thumbnail}'
+        return None
+
+
+class CachedIncidentTypeField(serializers.PrimaryKeyRelatedField):
+    """Incident type referenced by ID, looked up in the in-memory registry instead of the database"""
+
+    def to_internal_value(self, data):
+        incident_type = incident_types.get(data)
+        if incident_type is None:
+            self.fail('does_not_exist', pk_value=data)
+        return incident_type
+
 
 class IncidentSerializer(serializers.ModelSerializer):
+    incident_type = CachedIncidentTypeField(queryset=IncidentType.objects.all())
     site_name = serializers.CharField(source='site.name', read_only=True)
     incident_type_name = serializers.CharField(source='incident_type.name', read_only=True)
     incident_type_display = serializers.CharField(source='incident_type.display_name', read_only=True)
@@ -100,4 +119,11 @@ class NotificationEmailSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotificationEmail
         fields = ['id', 'email', 'created_at']
-        read_only_fields = ['id', 'created_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'created_at'] 
+
+
+class IncidentBatchItemSerializer(IncidentSerializer):
+    """One report of a batch submission; the view resolves its site and incident type in bulk"""
+
+    class Meta(IncidentSerializer.Meta):
+        fields = ['criticality', 'description', 'is_anonymous', 'reporter_name', 'reporter_phone']
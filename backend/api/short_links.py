@@ -0,0 +1,46 @@
+"""
+In-memory resolver for site short-link codes
+
+The code -> site ID map is loaded once per worker and kept current by model
+signals; codes created in another worker are picked up from the database on
+first use.
+"""
+import threading
+
+from .models import Site
+
+
+class ShortLinkMap:
+    """Resolve short-link codes to site IDs without a query per scan"""
+
+    def __init__(self):
+        self._codes = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._codes is None:
+                self._codes = dict(Site.objects.values_list('short_code', 'id'))
+        return self._codes
+
+    def resolve(self, code):
+        """Return the site ID for a short code, or None if there is no such site"""
+        code = code.upper()
+        codes = self._codes if self._codes is not None else self._load()
+        site_id = codes.get(code)
+        if site_id is None:
+            site_id = Site.objects.filter(short_code=code).values_list('id', flat=True).first()
+            if site_id is not None:
+                codes[code] = site_id
+        return site_id
+
+    def set(self, code, site_id):
+        if self._codes is not None:
+            self._codes[code] = site_id
+
+    def discard(self, code):
+        if self._codes is not None:
+            self._codes.pop(code, None)
+
+
+short_links = ShortLinkMap()
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .images import process_images_in_background
+from .incident_types import incident_types
+from .models import ImageBlob, Incident, IncidentImage, IncidentType, Site
+from .qr_cache import poster_cache, warm_site_poster
+from .rollups import adjust, incident_key, stored_key
+from .short_links import short_links
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_site_qr_posters(sender, instance, **kwargs):
+    """Drop cached QR posters whenever a site is saved or deleted"""
+    poster_cache.invalidate_site(instance.pk)
+
+
+@receiver(post_save, sender=Site)
+def warm_site_qr_poster(sender, instance, raw=False, **kwargs):
+    """Pre-render the poster of a created or updated site once the change is committed"""
+    if raw or not settings.QR_WARM_ON_SAVE:
+        return
+    transaction.on_commit(lambda: warm_site_poster(instance))
+
+
+@receiver(post_save, sender=Site)
+def register_site_short_link(sender, instance, **kwargs):
+    """Keep the in-memory short-link map in step with saved sites"""
+    short_links.set(instance.short_code, instance.pk)
+
+
+@receiver(post_delete, sender=Site)
+def unregister_site_short_link(sender, instance, **kwargs):
+    """Stop resolving the short link of a deleted site"""
+    short_links.discard(instance.short_code)
+
+
+@receiver(post_save, sender=IncidentType)
+@receiver(post_delete, sender=IncidentType)
+def invalidate_site_incident_types(sender, instance, **kwargs):
+    """Reload a site's cached incident types after one of them changes"""
+    incident_types.invalidate(instance.site_id)
+
+
+@receiver(post_save, sender=IncidentImage)
+def process_uploaded_incident_image(sender, instance, created, raw=False, **kwargs):
+    """Downscale, re-encode and thumbnail a new incident photo once its upload is committed"""
+    if raw or not created or instance.processed_at or not settings.INCIDENT_IMAGE_PROCESS_ON_UPLOAD:
+        return
+    transaction.on_commit(lambda: process_images_in_background([instance.pk]))
+
+
+@receiver(post_delete, sender=IncidentImage)
+def release_incident_image_blob(sender, instance, **kwargs):
+    """Drop the deleted image's reference to its shared file, collecting the file if it was the last"""
+    if instance.blob_id:
+        ImageBlob.release(instance.blob_id)
+
+
+@receiver(post_init, sender=Incident)
+def remember_incident_rollup_key(sender, instance, **kwargs):
+    """Note which rollup row a loaded incident is counted in, to tell later whether that changed"""
+    instance._rollup_key = incident_key(instance)
+
+
+@receiver(pre_save, sender=Incident)
+def load_incident_rollup_key(sender, instance, **kwargs):
+    """Read the rollup key of an incident saved without all of its rollup fields loaded"""
+    if instance._rollup_key is None and not instance._state.adding:
+        # Loaded with deferred fields; read the stored values before they are overwritten
+        instance._rollup_key = stored_key(instance.pk)
+
+
+@receiver(post_save, sender=Incident)
+def update_incident_rollup(sender, instance, created, **kwargs):
+    """Move the incident's count between rollup rows when it is created or changes status, type or criticality"""
+    key = incident_key(instance)
+    if key is None and not created:
+        key = stored_key(instance.pk)
+    if created:
+        adjust(key, 1)
+    elif key != instance._rollup_key:
+        if instance._rollup_key is not None:
+            adjust(instance._rollup_key, -1)
+        if key is not None:
+            adjust(key, 1)
+    instance._rollup_key = key
+
+
+@receiver(post_delete, sender=Incident)
+def remove_incident_from_rollup(sender, instance, **kwargs):
+    """Uncount a deleted incident"""
+    key = instance._rollup_key or incident_key(instance)
+    if key is not None:
+        adjust(key, -1)
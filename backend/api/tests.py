@@ -0,0 +1,364 @@
+import io
+import os
+import shutil
+import smtplib
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import qr_export
+from .mail_backends import AsyncSMTPEmailBackend
+from .models import Incident, IncidentImage, IncidentType, Site
+from .qr_cache import PosterCache
+from .search import search_incidents
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every delivered envelope and refuses one address"""
+
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == 'refused@example.com':
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append((envelope, session.ssl is not None))
+        return '250 OK'
+
+
+@unittest.skipUnless(Controller, 'aiosmtpd is not installed')
+class AsyncSMTPEmailBackendTests(SimpleTestCase):
+    """Deliveries through AsyncSMTPEmailBackend to a local aiosmtpd server"""
+
+    def start_server(self, **kwargs):
+        # aiosmtpd needs a concrete port, so borrow a free one from the OS
+        with socket.socket() as probe:
+            probe.bind(('localhost', 0))
+            port = probe.getsockname()[1]
+        handler = RecordingHandler()
+        controller = Controller(handler, hostname='localhost', port=port, **kwargs)
+        controller.start()
+        self.addCleanup(controller.stop)
+        return handler, port
+
+    def messages(self, count):
+        return [
+            EmailMessage(f'Report {number}', f'Body {number}\n.leading dot', 'hse@example.com', [f'user{number}@example.com'])
+            for number in range(count)
+        ]
+
+    def test_sends_every_message_over_the_pool(self):
+        handler, port = self.start_server()
+        backend = AsyncSMTPEmailBackend(host='localhost', port=port, username='', password='', use_tls=False, timeout=5, pool_size=3)
+
+        self.assertEqual(backend.send_messages(self.messages(20)), 20)
+        self.assertEqual(
+            sorted(envelope.rcpt_tos[0] for envelope, _ in handler.envelopes),
+            sorted(f'user{number}@example.com' for number in range(20)),
+        )
+        # Dot-stuffing is undone by the server
+        self.assertIn(b'\r\n.leading dot', handler.envelopes[0][0].original_content)
+
+    def test_sends_more_messages_than_the_pool_from_a_worker_thread(self):
+        handler, port = self.start_server()
+        backend = AsyncSMTPEmailBackend(host='localhost', port=port, username='', password='', use_tls=False, timeout=5, pool_size=2)
+        sent = []
+        worker = threading.Thread(target=lambda: sent.append(backend.send_messages(self.messages(7))))
+        worker.start()
+        worker.join()
+
+        self.assertEqual(sent, [7])
+        self.assertEqual(len(handler.envelopes), 7)
+
+    def test_refused_recipient_raises_and_keeps_sending(self):
+        handler, port = self.start_server()
+        backend = AsyncSMTPEmailBackend(host='localhost', port=port, username='', password='', use_tls=False, timeout=5, pool_size=1)
+        messages = self.messages(2)
+        messages.insert(1, EmailMessage('Refused', 'Body', 'hse@example.com', ['refused@example.com']))
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            backend.send_messages(messages)
+        self.assertEqual(len(handler.envelopes), 2)
+
+        backend.fail_silently = True
+        self.assertEqual(backend.send_messages(messages), 2)
+
+    @unittest.skipUnless(shutil.which('openssl'), 'openssl is needed to make a test certificate')
+    def test_starttls(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost', '-keyout', key, '-out', cert],
+            check=True, capture_output=True,
+        )
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert, key)
+        handler, port = self.start_server(tls_context=server_context, require_starttls=True)
+
+        backend = AsyncSMTPEmailBackend(host='localhost', port=port, username='', password='', use_tls=True, timeout=5, pool_size=2)
+        client_context = ssl.create_default_context(cafile=cert)
+        new_connection = backend._new_connection
+
+        def trusting_connection():
+            connection = new_connection()
+            connection.ssl_context = client_context
+            return connection
+
+        backend._new_connection = trusting_connection
+        self.assertEqual(backend.send_messages(self.messages(5)), 5)
+        self.assertEqual(len(handler.envelopes), 5)
+        self.assertTrue(all(over_tls for _, over_tls in handler.envelopes))
+
+
+class IncidentListQueryPlanTests(TestCase):
+    """Each incident list filter reads its page from an index range, without a table scan or sort"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Every filtered value is rare, so each filter's own index is the cheapest way in
+        sites = [Site.objects.create(name=f'Plant {number}', address='1 Road') for number in range(10)]
+        cls.site = sites[0]
+        types = {
+            site: [IncidentType.objects.create(site=site, name=name, display_name=name) for name in ('near_miss', 'injury')]
+            for site in sites
+        }
+        cls.near_miss = types[cls.site][0]
+        Incident.objects.bulk_create(
+            Incident(
+                site=site, incident_type=types[site][0 if number % 5 == 0 else 1], description=f'Report {number}',
+                is_anonymous=number % 7 == 0, criticality=['low', 'medium', 'high', 'critical'][number // 4 % 4],
+                status=['open', 'in_progress', 'resolved', 'closed'][number % 4],
+            )
+            for site in sites
+            for number in range(40)
+        )
+
+    def page_query_plan(self, params):
+        """Fetch a deep list page and return the query plan of its incident query"""
+        first = self.client.get('/hex/api/incidents/', {**params, 'page_size': 2})
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(first.json()['next']).status_code, 200)
+        sql = next(query['sql'] for query in queries.captured_queries if 'FROM "api_incident" ' in query['sql'])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Small test tables are otherwise cheapest to read whole and sort, which
+                # would hide whether an index can return the page in order
+                cursor.execute('ANALYZE api_incident')
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, params, index):
+        plan = self.page_query_plan(params)
+        if connection.vendor == 'sqlite':
+            self.assertIn(f'SEARCH api_incident USING INDEX {index} ', plan)
+            self.assertNotIn('SCAN api_incident ', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertIn(index, plan)
+            self.assertNotIn('Seq Scan on api_incident ', plan)
+            self.assertNotIn('Sort', plan)
+        else:
+            self.skipTest(f'No query plan checks for {connection.vendor}')
+
+    def test_filters_use_matching_indexes(self):
+        site = str(self.site.pk)
+        cases = [
+            ({}, 'api_incident_created_idx'),
+            ({'created_after': '2020-01-01', 'created_before': '2100-01-01'}, 'api_incident_created_idx'),
+            ({'site': site}, 'api_incident_site_idx'),
+            ({'site': site, 'status': 'open'}, 'api_incident_site_status_idx'),
+            ({'site': site, 'criticality': 'high'}, 'api_incident_site_crit_idx'),
+            ({'status': 'open'}, 'api_incident_status_idx'),
+            ({'criticality': 'high'}, 'api_incident_crit_idx'),
+            ({'incident_type': str(self.near_miss.pk)}, 'api_incident_type_idx'),
+            ({'site': site, 'incident_type': 'near_miss'}, 'api_incident_type_idx'),
+            ({'is_anonymous': 'true'}, 'api_incident_anonymous_idx'),
+        ]
+        for params, index in cases:
+            with self.subTest(params=params):
+                self.assertUsesIndex(params, index)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Reporter names are only indexed unstemmed on PostgreSQL')
+class PostgreSQLIncidentSearchTests(TestCase):
+    """Reporter names match as written, even where the English stemmer would change them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name='Plant', address='1 Road')
+        incident_type = IncidentType.objects.create(site=site, name='near_miss', display_name='Near Miss')
+        cls.incident = Incident.objects.create(
+            site=site, incident_type=incident_type, description='Oil spills near the pumps', reporter_name='Mary Will',
+        )
+
+    def test_reporter_names_and_stemmed_descriptions_match(self):
+        for query in ('Mary', 'mar', 'Will', 'Mary Will', 'spilled', 'Mary pump'):
+            with self.subTest(query=query):
+                self.assertEqual(list(search_incidents(Incident.objects.all(), query)), [self.incident])
+        self.assertFalse(search_incidents(Incident.objects.all(), 'Mary John').exists())
+
+
+class PosterCacheTests(SimpleTestCase):
+    """Rendering and coalescing of QR posters in PosterCache"""
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.cache = PosterCache(max_entries=8, cache_dir=cache_dir)
+        self.site = Site(name='Plant', address='1 Road')
+
+    def test_parallel_misses_render_once(self):
+        renders = []
+
+        def slow_render(site_name, qr_url):
+            renders.append(site_name)
+            time.sleep(0.2)  # Long enough for every other thread to miss meanwhile
+            return b'poster'
+
+        threads = 8
+        barrier = threading.Barrier(threads)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(self.cache.get_or_render(self.site, 'https://example.com/s/abc'))
+
+        with mock.patch('api.qr_cache.render_poster', side_effect=slow_render):
+            workers = [threading.Thread(target=request) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(results, [b'poster'] * threads)
+
+    def test_failed_render_is_not_cached(self):
+        with mock.patch('api.qr_cache.render_poster', side_effect=OSError('font missing')):
+            with self.assertRaises(OSError):
+                self.cache.get_or_render(self.site, 'https://example.com/s/abc')
+        with mock.patch('api.qr_cache.render_poster', return_value=b'poster') as render:
+            self.assertEqual(self.cache.get_or_render(self.site, 'https://example.com/s/abc'), b'poster')
+            self.assertEqual(self.cache.get_or_render(self.site, 'https://example.com/s/abc'), b'poster')
+        self.assertEqual(render.call_count, 1)
+
+
+class RenderPoolTests(SimpleTestCase):
+    """Lifetime of the render pool shared by QR exports"""
+
+    def setUp(self):
+        patcher = mock.patch.object(qr_export, 'new_render_pool', side_effect=lambda workers: mock.Mock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, qr_export, '_render_pool', None)
+
+    def test_idle_pool_is_shut_down(self):
+        with self.settings(QR_EXPORT_POOL_IDLE_TIMEOUT=0.05):
+            pool = qr_export.acquire_render_pool()
+            self.assertIs(qr_export.acquire_render_pool(), pool)
+            qr_export.release_render_pool()
+            time.sleep(0.1)
+            # Still in use by the second export
+            pool.shutdown.assert_not_called()
+
+            qr_export.release_render_pool()
+            time.sleep(0.1)
+            pool.shutdown.assert_called_once()
+            self.assertIsNot(qr_export.acquire_render_pool(), pool)
+            qr_export.release_render_pool()
+
+    def test_pool_in_use_again_is_kept(self):
+        with self.settings(QR_EXPORT_POOL_IDLE_TIMEOUT=0.05):
+            pool = qr_export.acquire_render_pool()
+            qr_export.release_render_pool()
+            self.assertIs(qr_export.acquire_render_pool(), pool)
+            time.sleep(0.1)
+            pool.shutdown.assert_not_called()
+            qr_export.release_render_pool()
+
+
+class ImageVariantTests(TestCase):
+    """Caching of resized incident image variants"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = self.settings(MEDIA_ROOT=media_root, INCIDENT_IMAGE_PROCESS_ON_UPLOAD=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        site = Site.objects.create(name='Plant', address='1 Road')
+        incident_type = IncidentType.objects.create(site=site, name='near_miss', display_name='Near Miss')
+        incident = Incident.objects.create(site=site, incident_type=incident_type, description='Report', is_anonymous=True)
+        photo = io.BytesIO()
+        Image.new('RGB', (800, 600), 'orange').save(photo, 'JPEG')
+        self.image = IncidentImage(incident=incident)
+        self.image.image.save('photo.jpg', ContentFile(photo.getvalue()))
+        self.url = f'/hex/api/incident-images/{self.image.pk}/w/320/'
+
+    def test_variant_revalidates_with_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Once processed, the same URL serves a different file
+        IncidentImage.objects.filter(pk=self.image.pk).update(processed_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class IncidentListQueryCountTests(TestCase):
+    """An incident list page costs the same number of queries however many incidents, sites and images it shows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            site = Site.objects.create(name=f'Plant {number}', address='1 Road')
+            for name in ('near_miss', 'injury'):
+                incident_type = IncidentType.objects.create(site=site, name=name, display_name=name.title())
+                for _ in range(3):
+                    incident = Incident.objects.create(site=site, incident_type=incident_type, description='Report', is_anonymous=True)
+                    IncidentImage.objects.bulk_create(
+                        IncidentImage(incident=incident, image=f'incident_images/{incident.pk}-{index}.jpg') for index in range(2)
+                    )
+
+    def test_list_page_query_count(self):
+        # The page of incidents with their site and type, then one query for all their images
+        with self.assertNumQueries(2):
+            response = self.client.get('/hex/api/incidents/', {'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 18)
+        self.assertTrue(all(result['image_count'] == 2 and len(result['images']) == 2 for result in results))
@@ -0,0 +1,103 @@
+"""
+Streaming upload handler for incident photos
+
+Files are written to temporary files chunk by chunk (never held in memory),
+hashed as they stream in, and checked against per-file and per-request byte
+limits. The first bytes of every file must look like an image. A request
+that breaks a rule is abandoned on the spot, without reading the rest of its
+body, and the view answers with the recorded rejection.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import QueryDict
+from django.template.defaultfilters import filesizeformat
+from django.utils.datastructures import MultiValueDict
+import hashlib
+
+# Leading bytes of the image formats accepted from cameras and galleries. Only formats
+# Pillow decodes out of the box: HEIC would be stored but fail every processing step
+IMAGE_SIGNATURES = [
+    (0, b'\xff\xd8\xff'),                 # JPEG
+    (0, b'\x89PNG\r\n\x1a\n'),            # PNG
+    (0, b'GIF87a'),
+    (0, b'GIF89a'),
+    (8, b'WEBP'),                         # RIFF....WEBP
+]
+SIGNATURE_LENGTH = max(offset + len(signature) for offset, signature in IMAGE_SIGNATURES)
+
+
+def looks_like_image(header):
+    """Return whether the first bytes of a file match a known image format"""
+    return any(header[offset:offset + len(signature)] == signature for offset, signature in IMAGE_SIGNATURES)
+
+
+class UploadRejected:
+    """Why an upload was stopped: an HTTP status code and a message for the client"""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.message = message
+
+
+class IncidentImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream incident photos to temporary files with hashing, size limits and
+    an early image-type check. Completed files carry a `sha256` attribute.
+    """
+
+    def __init__(self, request=None, max_file_size=None, max_request_size=None):
+        super().__init__(request)
+        self.max_file_size = max_file_size or settings.INCIDENT_UPLOAD_MAX_FILE_SIZE
+        self.max_request_size = max_request_size or settings.INCIDENT_UPLOAD_MAX_REQUEST_SIZE
+        self.rejection = None
+        self.total_size = 0
+
+    def reject(self, status_code, message):
+        self.rejection = UploadRejected(status_code, message)
+        # connection_reset skips draining the remaining request body
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_request_size:
+            # Refuse before reading a single byte of the body
+            self.rejection = UploadRejected(413, f'Upload exceeds the {filesizeformat(self.max_request_size)} request limit')
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.header = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self.header) < SIGNATURE_LENGTH:
+            self.header += raw_data[:SIGNATURE_LENGTH - len(self.header)]
+            if len(self.header) >= SIGNATURE_LENGTH and not looks_like_image(self.header):
+                self.reject(415, f'"{self.file_name}" is not a supported image')
+
+        self.total_size += len(raw_data)
+        if start + len(raw_data) > self.max_file_size:
+            self.reject(413, f'"{self.file_name}" exceeds the {filesizeformat(self.max_file_size)} per-image limit')
+        if self.total_size > self.max_request_size:
+            self.reject(413, f'Upload exceeds the {filesizeformat(self.max_request_size)} request limit')
+
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if len(self.header) < SIGNATURE_LENGTH and not looks_like_image(self.header):
+            # Files shorter than the signature never got checked in receive_data_chunk
+            self.file.close()
+            self.reject(415, f'"{self.file_name}" is not a supported image')
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+def get_upload_rejection(request):
+    """Return the UploadRejected recorded while parsing a request's files, or None"""
+    for handler in request.upload_handlers:
+        rejection = getattr(handler, 'rejection', None)
+        if rejection is not None:
+            return rejection
+    return None
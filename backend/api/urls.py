@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    SiteViewSet, EmergencyContactViewSet, IncidentViewSet, 
+    SiteViewSet, EmergencyContactViewSet, IncidentViewSet, IncidentImageViewSet, IncidentAnalyticsViewSet,
     NotificationEmailViewSet, AuthViewSet, IncidentTypeViewSet
 )
 
@@ -9,6 +9,8 @@ router = DefaultRouter()
 router.register(r'sites', SiteViewSet)
 router.register(r'emergency-contacts', EmergencyContactViewSet)
 router.register(r'incidents', IncidentViewSet)
+router.register(r'incident-images', IncidentImageViewSet)
+router.register(r'analytics/incidents', IncidentAnalyticsViewSet, basename='incident-analytics')
 router.register(r'notification-emails', NotificationEmailViewSet)
 router.register(r'incident-types', IncidentTypeViewSet)
 router.register(r'auth', AuthViewSet, basename='auth')
@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 from .models import NotificationEmail
 import logging
@@ -6,48 +6,100 @@ import logging
 # Set up logging for email errors
 logger = logging.getLogger(__name__)
 
-def send_incident_notification(incident):
-    """
-    Send simple email notification for new incidents to configured recipients
-    This function is designed to fail gracefully and not break the main application
-    """
-    try:
-        # Get notification emails from database
-        notification_emails = list(NotificationEmail.objects.values_list('email', flat=True))
-        
-        if not notification_emails:
-            logger.info("No notification emails configured in database - skipping email notification")
-            return True  # Return True to indicate "success" (no emails to send)
-        
-        subject = f"New Safety Incident Report - {incident.get_incident_type_display()}"
-        
-        message = f"""
-New safety incident reported:
+NOTIFICATION_FROM_EMAIL = 'safety@hexaclimate.com'
 
-Site: {incident.site.name}
-Type: {incident.get_incident_type_display()}
+
+def get_notification_recipients():
+    """Return the notification email addresses configured in the database"""
+    return list(NotificationEmail.objects.values_list('email', flat=True))
+
+
+def describe_incident(incident):
+    """Return the plain-text summary of an incident used in notification emails"""
+    return f"""Site: {incident.site.name}
+Type: {incident.incident_type.display_name}
 Criticality: {incident.get_criticality_display() if incident.criticality else 'N/A'}
 Description: {incident.description}
 Reporter: {'Anonymous' if incident.is_anonymous else incident.reporter_name}
-Date: {incident.created_at.strftime('%Y-%m-%d %H:%M:%S')}
+Date: {incident.created_at.strftime('%Y-%m-%d %H:%M:%S')}"""
+
+
+def build_incident_email(incident):
+    """Return the (subject, message) of the notification email for an incident"""
+    subject = f"New Safety Incident Report - {incident.incident_type.display_name}"
+    
+    message = f"""
+New safety incident reported:
+
+{describe_incident(incident)}
 
 This is an automated notification from the Hexa Climate Safety System.
         """
-        
-        # Use fail_silently=True to prevent email errors from breaking the application
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email='safety@hexaclimate.com',
-            recipient_list=notification_emails,
-            fail_silently=True,  # Changed to True to prevent breaking the app
-        )
-        
-        logger.info(f"Incident notification sent to {len(notification_emails)} recipients")
+    return subject, message
+
+
+def build_digest_email(incidents):
+    """Return the (subject, message) of one email summarising several incidents"""
+    subject = f"Safety Incident Digest - {len(incidents)} new reports"
+    
+    reports = "\n\n".join(
+        f"{number}. {describe_incident(incident)}"
+        for number, incident in enumerate(incidents, start=1)
+    )
+    message = f"""
+{len(incidents)} new safety incidents reported:
+
+{reports}
+
+This is an automated notification from the Hexa Climate Safety System.
+        """
+    return subject, message
+
+
+def deliver_incident_notification(incidents, connection=None):
+    """
+    Email one incident, or a digest of several, and return how many recipients were addressed
+
+    Each recipient gets their own message and all of them go out through a
+    single SMTP session (pass `connection` to share one across calls).
+    Unlike send_incident_notification, delivery errors are raised so the
+    notification outbox worker can retry them.
+    """
+    if not isinstance(incidents, (list, tuple)):
+        incidents = [incidents]
+    
+    notification_emails = get_notification_recipients()
+    
+    if not notification_emails:
+        logger.info("No notification emails configured in database - skipping email notification")
+        return 0
+    
+    if len(incidents) == 1:
+        subject, message = build_incident_email(incidents[0])
+    else:
+        subject, message = build_digest_email(incidents)
+    
+    messages = [
+        EmailMessage(subject=subject, body=message, from_email=NOTIFICATION_FROM_EMAIL, to=[email])
+        for email in notification_emails
+    ]
+    (connection or get_connection()).send_messages(messages)
+    
+    logger.info(f"Notification for {len(incidents)} incidents sent to {len(notification_emails)} recipients")
+    return len(notification_emails)
+
+
+def send_incident_notification(incident):
+    """
+    Send simple email notification for new incidents to configured recipients
+    This function is designed to fail gracefully and not break the main application
+    """
+    try:
+        deliver_incident_notification(incident)
         return True
         
     except Exception as e:
         # Log the error but don't let it break the application
         logger.error(f"Email notification failed for incident {incident.id}: {str(e)}")
         logger.error("This error will not affect the incident submission process")
-        return True  # Return True to indicate "success" even if email fails 
\ No newline at end of file
+        return True  # Return True to indicate "success" even if email fails
@@ -2,26 +2,44 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.conf import settings
-import qrcode
-import io
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from datetime import date
 import base64
-import os
-from PIL import Image, ImageDraw, ImageFont
+import json
+import uuid
 
-from .models import Site, EmergencyContact, Incident, IncidentImage, NotificationEmail, IncidentType
+from .models import Site, EmergencyContact, Incident, IncidentImage, IncidentRollup, ImageBlob, NotificationEmail, IncidentType
 from .serializers import (
     SiteSerializer, SiteDetailSerializer,
     EmergencyContactSerializer,
-    IncidentSerializer, NotificationEmailSerializer, IncidentTypeSerializer
+    IncidentSerializer, IncidentBatchItemSerializer, IncidentImageSerializer, NotificationEmailSerializer, IncidentTypeSerializer
 )
-from .utils import send_incident_notification
+from .filters import IncidentFilterBackend
+from .idempotency import IdempotencyError, claim_key, get_idempotency_key, replay_response, request_fingerprint, store_response
+from .images import IMAGE_FORMATS, UndecodableImage, get_variant, process_images_in_background, variant_etag
+from .incident_types import incident_types
+from .outbox import enqueue_batch_notification, enqueue_incident_notification
+from .pagination import IncidentCursorPagination
+from .qr import build_qr_url
+from .qr_cache import poster_cache, poster_etag
+from .qr_export import EXPORT_FORMATS, stream_export
+from .qr_vector import VECTOR_FORMATS, render_vector_poster
+from .renderers import PNGRenderer, ZIPRenderer, PDFRenderer, SVGRenderer
+from .rollups import record_incidents
+from .search import search_incidents
+from .short_links import short_links
+from .uploads import IncidentImageUploadHandler, get_upload_rejection
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -96,6 +114,16 @@ class SiteViewSet(viewsets.ModelViewSet):
             return SiteDetailSerializer
         return SiteSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            # SiteDetailSerializer nests contacts and incidents with their images
+            queryset = queryset.prefetch_related(
+                'emergency_contacts',
+                Prefetch('incidents', queryset=Incident.objects.with_details()),
+            )
+        return queryset
+
     def create_default_incident_types(self, site):
         """Create default incident types for a new site"""
         default_types = [
@@ -212,217 +240,28 @@ class SiteViewSet(viewsets.ModelViewSet):
         
         return Response(all_contacts)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'],
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [SVGRenderer, PDFRenderer])
     def qr_code(self, request, pk=None):
         site = self.get_object()
         
         # Generate QR code URL - use production URL for hosted environment
-        from django.conf import settings
-        
-        # Check if we're in production (not localhost)
-        if 'localhost' in request.get_host() or '127.0.0.1' in request.get_host():
-            # Development environment
-            qr_url = f"{request.scheme}://{request.get_host()}/public/{site.id}/"
-        else:
-            # Production environment - use the configured production URL
-            qr_url = f"{settings.PRODUCTION_URL}/public/{site.id}/"
+        qr_url = build_qr_url(request, site)
         
         # Debug: Print the generated URL
         print(f"Generated QR URL for site {site.name} (ID: {site.id}): {qr_url}")
         
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_url)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        qr_image.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
-        
-        # Create composite image with fixed layout
-        qr_size = 300
-        header_height = 70
-        description_height = 80
-        
-        # Fixed layout parameters
-        margin_top = 25
-        margin_bottom = 35
-        margin_left = 20
-        margin_right = 20
+        # ?format=svg|pdf returns a vector poster for print shops instead of the PNG JSON payload
+        vector_format = request.accepted_renderer.format
+        if vector_format in VECTOR_FORMATS:
+            poster = render_vector_poster(site.name, qr_url, vector_format)
+            response = HttpResponse(poster, content_type=VECTOR_FORMATS[vector_format])
+            response['Content-Disposition'] = f'inline; filename="{site.id}-qr-code.{vector_format}"'
+            return response
         
-        # Calculate total dimensions with fixed margins
-        total_width = qr_size + margin_left + margin_right
-        total_height = margin_top + header_height + qr_size + description_height + margin_bottom + 15
-        
-        composite = Image.new('RGB', (total_width, total_height), 'white')
-        draw = ImageDraw.Draw(composite)
-        
-        # Try to use fixed fonts
-        try:
-            header_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 28)
-            desc_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 18)
-        except:
-            header_font = ImageFont.load_default()
-            desc_font = ImageFont.load_default()
-        
-        # Position logo and site name at the top with fixed alignment
-        logo_size = 50
-        logo_x = margin_left
-        logo_y = margin_top + (header_height - logo_size) // 2
-        
-        # Try to load Hexa Climate logo from local PNG file
-        logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'image.png')
-        
-        if os.path.exists(logo_path):
-            try:
-                logo_img = Image.open(logo_path)
-                # Resize logo to fit
-                logo_img = logo_img.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-                # Paste logo onto composite image
-                composite.paste(logo_img, (logo_x, logo_y), logo_img if logo_img.mode == 'RGBA' else None)
-                print(f"✅ Hexa Climate logo loaded from: {logo_path}")
-            except Exception as e:
-                print(f"⚠️  Error loading local logo: {e}")
-                # Fallback to text logo
-                logo_text = "HEXA"
-                logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-                logo_width = logo_bbox[2] - logo_bbox[0]
-                draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-        else:
-            print(f"⚠️  Logo not found at: {logo_path}")
-            # Fallback to text logo
-            logo_text = "HEXA"
-            logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-            logo_width = logo_bbox[2] - logo_bbox[0]
-            draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-        
-        # Handle site name with better positioning and alignment
-        site_name = site.name
-        site_bbox = draw.textbbox((0, 0), site_name, font=header_font)
-        site_width = site_bbox[2] - site_bbox[0]
-        site_height = site_bbox[3] - site_bbox[1]
-        
-        # Calculate available space for site name
-        logo_end = logo_x + logo_size + 20  # Increased spacing
-        available_width = total_width - logo_end - 30
-        
-        # Check if site name fits, if not, try smaller font
-        if site_width > available_width:
-            try:
-                smaller_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 22)
-                site_bbox = draw.textbbox((0, 0), site_name, font=smaller_font)
-                site_width = site_bbox[2] - site_bbox[0]
-                site_height = site_bbox[3] - site_bbox[1]
-                
-                if site_width > available_width:
-                    # For extremely long names, adjust the total width to accommodate the full name
-                    required_width = logo_end + site_width + 30  # logo + spacing + site name + margin
-                    if required_width > total_width:
-                        # Recalculate total width to fit the full site name
-                        total_width = required_width
-                        # Recreate the composite image with new width
-                        composite = Image.new('RGB', (total_width, total_height), 'white')
-                        draw = ImageDraw.Draw(composite)
-                        
-                        # Reload logo with new positioning
-                        if os.path.exists(logo_path):
-                            try:
-                                logo_img = Image.open(logo_path)
-                                logo_img = logo_img.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-                                composite.paste(logo_img, (logo_x, logo_y), logo_img if logo_img.mode == 'RGBA' else None)
-                            except Exception as e:
-                                print(f"⚠️  Error loading local logo: {e}")
-                                logo_text = "HEXA"
-                                logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-                                draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-                        else:
-                            logo_text = "HEXA"
-                            logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-                            draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-                        
-                        print(f"✅ Adjusted total width to {total_width}px to accommodate full site name")
-                
-                # Position site name to the right of logo with fixed vertical alignment
-                site_x = logo_end
-                site_y = margin_top + (header_height - site_height) // 2  # Center vertically
-                draw.text((site_x, site_y), site_name, fill='black', font=smaller_font)
-            except:
-                # Fallback to default font with width adjustment
-                site_bbox = draw.textbbox((0, 0), site_name, font=header_font)
-                site_width = site_bbox[2] - site_bbox[0]
-                site_height = site_bbox[3] - site_bbox[1]
-                
-                # Adjust total width if needed
-                required_width = logo_end + site_width + 30
-                if required_width > total_width:
-                    total_width = required_width
-                    composite = Image.new('RGB', (total_width, total_height), 'white')
-                    draw = ImageDraw.Draw(composite)
-                    
-                    # Reload logo
-                    if os.path.exists(logo_path):
-                        try:
-                            logo_img = Image.open(logo_path)
-                            logo_img = logo_img.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-                            composite.paste(logo_img, (logo_x, logo_y), logo_img if logo_img.mode == 'RGBA' else None)
-                        except Exception as e:
-                            logo_text = "HEXA"
-                            logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-                            draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-                    else:
-                        logo_text = "HEXA"
-                        logo_bbox = draw.textbbox((0, 0), logo_text, font=header_font)
-                        draw.text((logo_x, logo_y + 10), logo_text, fill='black', font=header_font)
-                
-                site_x = logo_end
-                site_y = margin_top + (header_height - site_height) // 2
-                draw.text((site_x, site_y), site_name, fill='black', font=header_font)
-        else:
-            # Position site name to the right of logo with fixed vertical alignment
-            site_x = logo_end
-            site_y = margin_top + (header_height - site_height) // 2  # Center vertically
-            draw.text((site_x, site_y), site_name, fill='black', font=header_font)
-        
-        # Perfect centering calculations for QR code
-        # Horizontal centering - ensure QR is perfectly centered
-        qr_x = (total_width - qr_size) // 2
-        
-        # Vertical centering - QR should be exactly in the middle of the available space
-        header_y = margin_top
-        header_bottom = header_y + header_height
-        
-        # Calculate the middle point between header and description
-        description = "Scan for Site info and Reporting Issues"
-        desc_bbox = draw.textbbox((0, 0), description, font=desc_font)
-        desc_height = desc_bbox[3] - desc_bbox[1]
-        desc_y = total_height - margin_bottom - desc_height
-        
-        # Calculate the exact middle point between header bottom and description top
-        # Add more space between QR and description
-        available_height = desc_y - header_bottom
-        qr_y = header_bottom + (available_height - qr_size) // 2
-        
-        # Add QR code with perfect centering
-        composite.paste(qr_image, (qr_x, qr_y))
-        
-        # Center the description text at the bottom with more spacing
-        desc_width = desc_bbox[2] - desc_bbox[0]
-        desc_x = (total_width - desc_width) // 2
-        draw.text((desc_x, desc_y), description, fill='black', font=desc_font)
-        
-        # Convert composite to base64
-        buffer = io.BytesIO()
-        composite.save(buffer, format='PNG')
-        composite_base64 = base64.b64encode(buffer.getvalue()).decode()
+        # Served from the poster cache; only renders when the site or layout changed
+        poster = poster_cache.get_or_render(site, qr_url)
+        composite_base64 = base64.b64encode(poster).decode()
         
         return Response({
             'qr_code': f"data:image/png;base64,{composite_base64}",
@@ -430,6 +269,53 @@ class SiteViewSet(viewsets.ModelViewSet):
             'site_name': site.name
         })
 
+    @action(detail=True, methods=['get'], renderer_classes=[PNGRenderer])
+    def qr_image(self, request, pk=None):
+        """Raw PNG poster with ETag/Last-Modified so browsers can revalidate cheaply"""
+        site = self.get_object()
+        qr_url = build_qr_url(request, site)
+        etag = poster_etag(site, qr_url)
+        last_modified = int(site.updated_at.timestamp())
+        
+        # Answer 304 Not Modified before touching the poster cache
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        
+        poster = poster_cache.get_or_render(site, qr_url)
+        response = HttpResponse(poster, content_type='image/png')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        response['Content-Disposition'] = f'inline; filename="{site.id}-qr-code.png"'
+        return response
+
+    @action(detail=False, methods=['get'], renderer_classes=[ZIPRenderer, PDFRenderer])
+    def qr_export(self, request):
+        """
+        Stream posters for many sites as a ZIP of PNGs (?format=zip, default)
+        or a multi-page PDF (?format=pdf). Limit to some sites with ?ids=<id>,<id>
+        """
+        sites = self.get_queryset()
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                site_ids = [uuid.UUID(site_id) for site_id in ids.split(',') if site_id]
+            except ValueError:
+                return Response({'error': 'ids must be a comma-separated list of site IDs'}, status=status.HTTP_400_BAD_REQUEST)
+            sites = sites.filter(id__in=site_ids)
+        
+        entries = [(site, build_qr_url(request, site)) for site in sites]
+        export_format = request.accepted_renderer.format
+        
+        response = StreamingHttpResponse(
+            stream_export(entries, export_format),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="site-qr-codes.{export_format}"'
+        return response
+
 
 class EmergencyContactViewSet(viewsets.ModelViewSet):
     queryset = EmergencyContact.objects.all()
@@ -447,21 +333,39 @@ class IncidentViewSet(viewsets.ModelViewSet):
     queryset = Incident.objects.all()
     serializer_class = IncidentSerializer
     permission_classes = [AllowAny]  # Allow public submission
+    pagination_class = IncidentCursorPagination
+    filter_backends = [IncidentFilterBackend]
 
     def get_queryset(self):
-        queryset = Incident.objects.all().order_by('-created_at')
-        
-        # Filter by site if provided
-        site_id = self.request.query_params.get('site', None)
-        if site_id:
-            queryset = queryset.filter(site_id=site_id)
-        
-        return queryset
+        # Filtering by query parameters happens in IncidentFilterBackend
+        return Incident.objects.with_details().order_by('-created_at')
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Photos must go through the streaming handler, which has to be installed before the body is parsed
+        if request.method == 'POST':
+            request.upload_handlers = [IncidentImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         # Handle image uploads
         images = request.FILES.getlist('images')
         
+        # Oversized or non-image uploads were cut off while streaming
+        rejection = get_upload_rejection(request)
+        if rejection is not None:
+            return Response({'error': rejection.message}, status=rejection.status_code)
+        
+        # Retries of an already stored submission get the original response back
+        try:
+            idempotency_key = get_idempotency_key(request)
+            if idempotency_key is not None:
+                fingerprint = request_fingerprint(request)
+                replay = replay_response(idempotency_key, fingerprint)
+                if replay is not None:
+                    return replay
+        except IdempotencyError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
         # Get the incident type object based on name and site
         incident_type_name = request.data.get('incident_type')
         site_id = request.data.get('site')
@@ -472,37 +376,160 @@ class IncidentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            incident_type = IncidentType.objects.get(site_id=site_id, name=incident_type_name)
-        except IncidentType.DoesNotExist:
+        incident_type = incident_types.resolve(site_id, incident_type_name)
+        if incident_type is None:
             return Response(
                 {'error': f'Incident type "{incident_type_name}" not found for this site'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create the incident with the incident type object
-        data = request.data.copy()
+        # Create the incident with the incident type object. Copy only the form
+        # fields: uploaded files live in temporary files that cannot be deep-copied
+        data = request.POST.copy() if request.FILES else request.data.copy()
         data['incident_type'] = incident_type.id
         
         # Create the incident
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        incident = serializer.save()
         
-        # Handle image uploads
-        for image in images:
-            IncidentImage.objects.create(incident=incident, image=image)
-        
-        # Send notification email - this will not break the application if it fails
-        email_sent = send_incident_notification(incident)
+        with transaction.atomic():
+            if idempotency_key is not None and not claim_key(idempotency_key, fingerprint):
+                # A concurrent duplicate committed first; nothing has been written yet
+                try:
+                    replay = replay_response(idempotency_key, fingerprint)
+                except IdempotencyError as e:
+                    return Response({'error': str(e)}, status=e.status_code)
+                return replay or Response(
+                    {'error': 'A request with this Idempotency-Key is still being processed'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            
+            incident = serializer.save()
+            
+            # Handle image uploads
+            for image in images:
+                IncidentImage.objects.create(incident=incident, image=image)
+            
+            # Queue the notification email in the same transaction; the
+            # process_notification_outbox worker delivers it, so SMTP never
+            # delays the response
+            enqueue_incident_notification(incident)
+            
+            if idempotency_key is not None:
+                store_response(idempotency_key, status.HTTP_201_CREATED, serializer.data)
         
-        # Log the result but don't let email failures affect the response
-        if email_sent:
-            print(f"Email notification sent for incident {incident.id}")
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Submit several incidents at once (e.g. a kiosk flushing its offline queue)
+
+        `incidents` is a JSON list of reports with the same fields as a single
+        submission. Photos for the report at index i are sent as `images.<i>`
+        files. Valid reports are saved together and announced in one summary
+        email; every report gets its own entry in `results`.
+        """
+        rejection = get_upload_rejection(request)
+        if rejection is not None:
+            return Response({'error': rejection.message}, status=rejection.status_code)
+
+        items = request.data.get('incidents')
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                items = None
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'incidents must be a non-empty JSON list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.INCIDENT_BATCH_MAX_SIZE:
+            return Response(
+                {'error': f'At most {settings.INCIDENT_BATCH_MAX_SIZE} incidents can be submitted at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        incidents = []
+        images = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': {'error': 'Expected an object'}})
+                continue
+            # Served from memory once the site's incident types are loaded
+            incident_type = incident_types.resolve(item.get('site'), item.get('incident_type'))
+            if incident_type is None:
+                results.append({
+                    'index': index,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': {'error': f'Incident type "{item.get("incident_type")}" not found for this site'},
+                })
+                continue
+
+            serializer = IncidentBatchItemSerializer(data=item)
+            if not serializer.is_valid():
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+                continue
+
+            incident = Incident(site_id=incident_type.site_id, incident_type=incident_type, **serializer.validated_data)
+            incident.set_default_criticality()
+            incidents.append(incident)
+            images += [(incident, image) for image in request.FILES.getlist(f'images.{index}')]
+            results.append({'index': index, 'status': status.HTTP_201_CREATED, 'id': incident.id})
+
+        if incidents:
+            with transaction.atomic():
+                Incident.objects.bulk_create(incidents)
+                # bulk_create skips the signals that keep the dashboard counts current
+                record_incidents(incidents)
+
+                # Blobs are stored one by one (shared with identical uploads), the rows in bulk
+                incident_images = []
+                for incident, upload in images:
+                    incident_image = IncidentImage(incident=incident)
+                    incident_image.use_blob(ImageBlob.acquire(upload))
+                    incident_images.append(incident_image)
+                IncidentImage.objects.bulk_create(incident_images)
+
+                # bulk_create skips the post_save signal that schedules processing
+                pending = [image.pk for image in incident_images if not image.processed_at]
+                if pending and settings.INCIDENT_IMAGE_PROCESS_ON_UPLOAD:
+                    transaction.on_commit(lambda: process_images_in_background(pending))
+
+                enqueue_batch_notification(incidents)
+
+        if not incidents:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(incidents) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
         else:
-            print(f"Email notification failed for incident {incident.id} - but incident was saved successfully")
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            'created': len(incidents),
+            'failed': len(items) - len(incidents),
+            'results': results,
+        }, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over descriptions and reporter names, best matches first
+
+        Takes the search text in `q` plus any of the list filters and returns
+        the top `page_size` matches (20 by default).
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        queryset = search_incidents(self.filter_queryset(self.get_queryset()), query)
+        incidents = queryset.order_by('-search_rank', '-created_at')[:self.paginator.get_page_size(request)]
+        return Response({'results': self.get_serializer(incidents, many=True).data})
 
     def update(self, request, *args, **kwargs):
         """Override update to handle partial updates properly"""
@@ -531,6 +558,114 @@ class IncidentViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
+class IncidentImageViewSet(viewsets.GenericViewSet):
+    queryset = IncidentImage.objects.all()
+    serializer_class = IncidentImageSerializer
+    permission_classes = [AllowAny]  # Same audience as the public media URLs
+
+    @action(detail=True, methods=['get'], url_path=r'w/(?P<width>\d+)')
+    def variant(self, request, pk=None, width=None):
+        """
+        Serve the image resized to a whitelisted width, generated on the first
+        request and then served from disk. The URL stays the same when the
+        image is processed, so caches must revalidate; the ETag lets them do
+        so with a 304.
+        """
+        width = int(width)
+        if width not in settings.INCIDENT_IMAGE_VARIANT_WIDTHS:
+            raise Http404(f'Width must be one of {settings.INCIDENT_IMAGE_VARIANT_WIDTHS}')
+        
+        incident_image = self.get_object()
+        if not incident_image.image:
+            raise Http404('Image has no file')
+        
+        etag = variant_etag(incident_image, width)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        
+        try:
+            name = get_variant(incident_image, width)
+        except FileNotFoundError:
+            raise Http404('Image file is missing')
+        except UndecodableImage:
+            return Response(
+                {'error': 'Stored image cannot be decoded'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        content_type = IMAGE_FORMATS[settings.INCIDENT_IMAGE_FORMAT][2]
+        response = FileResponse(incident_image.image.storage.open(name, 'rb'), content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        return response
+
+
+class IncidentAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Incident counts for dashboards, read from the IncidentRollup table
+
+    `group_by` takes a comma-separated subset of site, incident_type,
+    criticality, status and day (default: status). Results can be narrowed
+    with site, incident_type, criticality and status (comma-separated) and
+    a start / end day range (inclusive).
+    """
+    permission_classes = [IsAuthenticated]
+    DIMENSIONS = {
+        'site': ['site_id', 'site__name'],
+        'incident_type': ['incident_type_id', 'incident_type__name', 'incident_type__display_name'],
+        'criticality': ['criticality'],
+        'status': ['status'],
+        'day': ['day'],
+    }
+
+    def list(self, request):
+        params = request.query_params
+        group_by = [name for name in params.get('group_by', 'status').split(',') if name]
+        unknown = [name for name in group_by if name not in self.DIMENSIONS]
+        if unknown:
+            return Response(
+                {'error': f'Cannot group by {", ".join(unknown)}; choose from {", ".join(self.DIMENSIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rollups = IncidentRollup.objects.all()
+        try:
+            for name, lookup in [('site', 'site_id__in'), ('incident_type', 'incident_type_id__in')]:
+                ids = [uuid.UUID(value) for value in params.get(name, '').split(',') if value]
+                if ids:
+                    rollups = rollups.filter(**{lookup: ids})
+        except ValueError:
+            return Response(
+                {'error': 'site and incident_type must be IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for name in ['criticality', 'status']:
+            values = [value for value in params.get(name, '').split(',') if value]
+            if values:
+                rollups = rollups.filter(**{f'{name}__in': values})
+        try:
+            if params.get('start'):
+                rollups = rollups.filter(day__gte=date.fromisoformat(params['start']))
+            if params.get('end'):
+                rollups = rollups.filter(day__lte=date.fromisoformat(params['end']))
+        except ValueError:
+            return Response(
+                {'error': 'start and end must be dates (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fields = [field for name in group_by for field in self.DIMENSIONS[name]]
+        groups = rollups.values(*fields).annotate(count=Sum('count')).order_by(*fields)
+        return Response({
+            'total': rollups.aggregate(total=Sum('count'))['total'] or 0,
+            'groups': [
+                {field.replace('__', '_'): value for field, value in group.items()}
+                for group in groups
+            ],
+        })
+
+
 class NotificationEmailViewSet(viewsets.ModelViewSet):
     queryset = NotificationEmail.objects.all()
     serializer_class = NotificationEmailSerializer
@@ -575,4 +710,12 @@ def public_site_view(request, site_id):
         </html>
         """)
     except Site.DoesNotExist:
-        return HttpResponse("Site not found", status=404) 
\ No newline at end of file
+        return HttpResponse("Site not found", status=404) 
+
+
+def short_link_redirect(request, code):
+    """Resolve a QR short link to the site's public feedback form"""
+    site_id = short_links.resolve(code)
+    if site_id is None:
+        raise Http404("Site not found")
+    return HttpResponseRedirect(f"{settings.PRODUCTION_URL}/public/{site_id}/")
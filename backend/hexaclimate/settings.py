@@ -106,6 +106,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/hex/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Rendered QR posters (in-process LRU size and on-disk cache directory)
+QR_POSTER_CACHE_SIZE = config('QR_POSTER_CACHE_SIZE', default=128, cast=int)
+QR_POSTER_CACHE_DIR = os.path.join(MEDIA_ROOT, 'qr_posters')
+
+# Render processes each web worker starts for bulk QR exports. Every process loads its own
+# Django and Pillow (about 65 MB each), so the total is web workers x QR_EXPORT_WORKERS; they
+# are spawned on the first export and shut down after QR_EXPORT_POOL_IDLE_TIMEOUT idle
+# seconds (0 keeps them for the life of the web worker)
+QR_EXPORT_WORKERS = config('QR_EXPORT_WORKERS', default=2, cast=int)
+QR_EXPORT_POOL_IDLE_TIMEOUT = config('QR_EXPORT_POOL_IDLE_TIMEOUT', default=300, cast=int)
+
+# Pre-render a site's QR poster in the background whenever the site is saved
+QR_WARM_ON_SAVE = config('QR_WARM_ON_SAVE', default=True, cast=bool)
+
+# Seconds a worker keeps a site's incident types in memory before reloading them
+INCIDENT_TYPE_CACHE_TTL = config('INCIDENT_TYPE_CACHE_TTL', default=300, cast=int)
+
+# Incident photos are re-encoded in the background after upload (format: 'webp' or 'jpeg')
+INCIDENT_IMAGE_PROCESS_ON_UPLOAD = config('INCIDENT_IMAGE_PROCESS_ON_UPLOAD', default=True, cast=bool)
+INCIDENT_IMAGE_FORMAT = config('INCIDENT_IMAGE_FORMAT', default='webp')
+INCIDENT_IMAGE_QUALITY = config('INCIDENT_IMAGE_QUALITY', default=82, cast=int)
+INCIDENT_IMAGE_MAX_EDGE = config('INCIDENT_IMAGE_MAX_EDGE', default=2048, cast=int)
+INCIDENT_THUMBNAIL_SIZE = config('INCIDENT_THUMBNAIL_SIZE', default=256, cast=int)
+
+# Widths served by /api/incident-images/{id}/w/{width}/ (anything else is a 404)
+INCIDENT_IMAGE_VARIANT_WIDTHS = [160, 320, 640, 1024, 1600]
+
+# Byte limits enforced while incident photos stream in (see api.uploads)
+INCIDENT_UPLOAD_MAX_FILE_SIZE = config('INCIDENT_UPLOAD_MAX_FILE_SIZE', default=20 * 2**20, cast=int)
+INCIDENT_UPLOAD_MAX_REQUEST_SIZE = config('INCIDENT_UPLOAD_MAX_REQUEST_SIZE', default=120 * 2**20, cast=int)
+# Most reports accepted by one POST /incidents/batch/ request
+INCIDENT_BATCH_MAX_SIZE = config('INCIDENT_BATCH_MAX_SIZE', default=50, cast=int)
+
+# Seconds a submission's response is kept for retries sent with the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -146,11 +182,16 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
+# Lets the frontend tell a replayed submission from a new one
+CORS_EXPOSE_HEADERS = [
+    'idempotent-replayed',
+]
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -174,6 +215,18 @@ DEFAULT_FROM_EMAIL = 'safety@hexaclimate.com'
 # Email timeout settings to prevent hanging
 EMAIL_TIMEOUT = 10  # 10 seconds timeout
 
+# Connections kept open (and messages in flight) by api.mail_backends.AsyncSMTPEmailBackend
+EMAIL_POOL_SIZE = config('EMAIL_POOL_SIZE', default=4, cast=int)
+
+# Notification outbox worker (python manage.py process_notification_outbox)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=8, cast=int)
+NOTIFICATION_RETRY_BASE_DELAY = config('NOTIFICATION_RETRY_BASE_DELAY', default=30, cast=int)  # seconds, doubled per attempt
+NOTIFICATION_RETRY_MAX_DELAY = config('NOTIFICATION_RETRY_MAX_DELAY', default=3600, cast=int)
+NOTIFICATION_POLL_INTERVAL = config('NOTIFICATION_POLL_INTERVAL', default=5, cast=int)
+
+# Collect non-critical incidents for this many seconds and email them as one digest (0 = send each at once)
+NOTIFICATION_DIGEST_WINDOW = config('NOTIFICATION_DIGEST_WINDOW', default=0, cast=int)
+
 # Incident notification emails (fallback list - now managed in database)
 INCIDENT_NOTIFICATION_EMAILS = [
     'nirbhay.dwivedi@hex',
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from django.http import HttpResponse
+from api.views import short_link_redirect
 
 def redirect_to_frontend(request, site_id):
     """Redirect to the frontend public feedback form"""
@@ -17,6 +18,7 @@ urlpatterns = [
     path('hex/admin/', admin.site.urls),
     path('hex/api/', include('api.urls')),
     path('public/<str:site_id>/', redirect_to_frontend, name='public_redirect'),
+    path('hex/s/<str:code>', short_link_redirect, name='short_link'),
 ]
 
 # Serve media files in development
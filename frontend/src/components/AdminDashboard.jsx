@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { Settings, Mail, AlertTriangle, Building2, Eye, CheckCircle, Clock, XCircle } from 'lucide-react'
-import { sitesAPI, incidentsAPI, notificationEmailsAPI } from '../services/api'
+import { sitesAPI, analyticsAPI, notificationEmailsAPI } from '../services/api'
 
 const AdminDashboard = () => {
   const navigate = useNavigate()
@@ -22,27 +22,26 @@ const AdminDashboard = () => {
   const fetchStats = async () => {
     try {
       setLoading(true)
-      const [sitesRes, incidentsRes, emailsRes] = await Promise.all([
+      const [sitesRes, analyticsRes, emailsRes] = await Promise.all([
         sitesAPI.getAll(),
-        incidentsAPI.getAll(),
+        analyticsAPI.incidents({ group_by: 'status' }),
         notificationEmailsAPI.getAll()
       ])
       
       const sites = sitesRes.data.results || sitesRes.data
-      const incidents = incidentsRes.data.results || incidentsRes.data
       const emails = emailsRes.data.results || emailsRes.data
       
-      // Calculate incident statistics
-      const openIncidents = incidents.filter(incident => incident.status === 'open').length
-      const resolvedIncidents = incidents.filter(incident => incident.status === 'resolved').length
-      const closedIncidents = incidents.filter(incident => incident.status === 'closed').length
+      // Incident counts per status, from the server-side rollups
+      const countByStatus = Object.fromEntries(
+        analyticsRes.data.groups.map(group => [group.status, group.count])
+      )
       
       setStats({
         sites: sites.length,
-        totalIncidents: incidents.length,
-        openIncidents,
-        resolvedIncidents,
-        closedIncidents,
+        totalIncidents: analyticsRes.data.total,
+        openIncidents: countByStatus.open || 0,
+        resolvedIncidents: countByStatus.resolved || 0,
+        closedIncidents: countByStatus.closed || 0,
         emails: emails.length
       })
     } catch (error) {
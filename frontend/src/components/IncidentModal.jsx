@@ -1,8 +1,9 @@
-import { useState } from 'react'
+import { useRef, useState } from 'react'
 import { X, Upload, User, Phone, Camera, Trash2 } from 'lucide-react'
 import { incidentsAPI } from '../services/api'
 import CameraCapture from './CameraCapture'
 import { isCameraSupported } from '../utils/cameraUtils'
+import { newIdempotencyKey } from '../utils/idempotency'
 
 const IncidentModal = ({ site, incidentType, onClose, onSubmitted }) => {
   const [formData, setFormData] = useState({
@@ -18,6 +19,11 @@ const IncidentModal = ({ site, incidentType, onClose, onSubmitted }) => {
   const [errors, setErrors] = useState({})
   const [imagePreviews, setImagePreviews] = useState([])
   const [showCamera, setShowCamera] = useState(false)
+  // Kept across retries of a submission that never got an answer, so the server can de-duplicate them
+  const idempotencyKey = useRef(null)
+  if (idempotencyKey.current === null) {
+    idempotencyKey.current = newIdempotencyKey()
+  }
 
   const criticalityLevels = [
     { value: 'low', label: 'Low', color: 'text-green-600' },
@@ -138,7 +144,7 @@ const IncidentModal = ({ site, incidentType, onClose, onSubmitted }) => {
         delete submitData.criticality
       }
       
-      const response = await incidentsAPI.create(submitData)
+      const response = await incidentsAPI.create(submitData, idempotencyKey.current)
       
       // Log success - email notifications are handled server-side
       console.log('Incident submitted successfully')
@@ -150,6 +156,10 @@ const IncidentModal = ({ site, incidentType, onClose, onSubmitted }) => {
       if (error.response?.data) {
         setErrors(error.response.data)
       }
+      if (error.response) {
+        // The server answered, so a corrected resubmission is a new request
+        idempotencyKey.current = newIdempotencyKey()
+      }
     } finally {
       setLoading(false)
     }
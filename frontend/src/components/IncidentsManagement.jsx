@@ -13,22 +13,35 @@ const IncidentsManagement = () => {
   const [selectedImage, setSelectedImage] = useState(null)
 
   useEffect(() => {
-    fetchData()
+    fetchSites()
   }, [])
 
-  const fetchData = async () => {
+  useEffect(() => {
+    fetchIncidents()
+  }, [selectedSite, selectedType, selectedStatus])
+
+  const fetchSites = async () => {
+    try {
+      const sitesResponse = await sitesAPI.getAll()
+      setSites(sitesResponse.data.results || sitesResponse.data)
+    } catch (error) {
+      console.error('Error fetching sites:', error)
+    }
+  }
+
+  const fetchIncidents = async () => {
     try {
       setLoading(true)
-      const [incidentsResponse, sitesResponse] = await Promise.all([
-        incidentsAPI.getAll(),
-        sitesAPI.getAll()
-      ])
-      console.log('Fetched incidents:', incidentsResponse.data)
-      console.log('First incident images:', incidentsResponse.data[0]?.images)
+      // Filtering happens on the server; closed incidents are hidden unless asked for
+      const params = {
+        status: selectedStatus || 'open,in_progress,resolved',
+      }
+      if (selectedSite) params.site = selectedSite
+      if (selectedType) params.incident_type = selectedType
+      const incidentsResponse = await incidentsAPI.getAll(params)
       setIncidents(incidentsResponse.data.results || incidentsResponse.data)
-      setSites(sitesResponse.data.results || sitesResponse.data)
     } catch (error) {
-      console.error('Error fetching data:', error)
+      console.error('Error fetching incidents:', error)
     } finally {
       setLoading(false)
     }
@@ -103,15 +116,6 @@ const IncidentsManagement = () => {
     }
   }
 
-  const filteredIncidents = incidents.filter(incident => {
-    // Always exclude closed incidents unless specifically filtering for them
-    if (incident.status === 'closed' && selectedStatus !== 'closed') return false
-    if (selectedSite && incident.site !== selectedSite) return false
-    if (selectedType && incident.incident_type !== selectedType) return false
-    if (selectedStatus && incident.status !== selectedStatus) return false
-    return true
-  })
-
   const sitesSorted = [...sites].sort((a, b) => a.name.localeCompare(b.name))
 
   return (
@@ -183,7 +187,7 @@ const IncidentsManagement = () => {
 
       {/* Incidents List */}
       <div className="space-y-4">
-        {filteredIncidents.map(incident => (
+        {incidents.map(incident => (
           <div key={incident.id} className="bg-white rounded-lg border p-6 shadow-sm">
             <div className="flex flex-col sm:flex-row sm:justify-between sm:items-start gap-4 mb-4">
               <div className="flex items-center space-x-3">
@@ -258,14 +262,14 @@ const IncidentsManagement = () => {
         ))}
       </div>
 
-      {filteredIncidents.length === 0 && !loading && (
+      {incidents.length === 0 && !loading && (
         <div className="text-center py-12">
           <div className="text-gray-400 mb-4">
             <AlertTriangle className="h-12 w-12 mx-auto" />
           </div>
           <h3 className="text-lg font-medium text-gray-900 mb-2">No incidents found</h3>
           <p className="text-gray-600">
-            {incidents.length === 0 
+            {!selectedSite && !selectedType && !selectedStatus
               ? 'No incidents have been reported yet.'
               : 'No incidents match the current filters.'
             }
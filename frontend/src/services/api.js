@@ -72,7 +72,8 @@ export const contactsAPI = {
 export const incidentsAPI = {
   getAll: (params) => api.get('/incidents/', { params }),
   getById: (id) => api.get(`/incidents/${id}/`),
-  create: (data) => {
+  // Retries with the same idempotencyKey return the first response instead of creating a duplicate
+  create: (data, idempotencyKey) => {
     const formData = new FormData()
     
     // Add all text fields
@@ -92,6 +93,7 @@ export const incidentsAPI = {
     return api.post('/incidents/', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
+        ...(idempotencyKey && { 'Idempotency-Key': idempotencyKey }),
       },
     })
   },
@@ -117,6 +119,11 @@ export const incidentTypesAPI = {
   delete: (id) => api.delete(`/incident-types/${id}/`),
 }
 
+// Analytics API
+export const analyticsAPI = {
+  incidents: (params) => api.get('/analytics/incidents/', { params }),
+}
+
 // Auth API
 export const authAPI = {
   login: (credentials) => api.post('/auth/login/', credentials),